@@ -37,6 +37,11 @@ BEE_ACTIONS = [FORWARD, REVERSE, SPIN_LEFT, SPIN_RIGHT]
 # total_cost = base_cost + push_cost if bee is pushing or pulling a widget, else total_cost = base_cost
 ACTION_BASE_COST = {FORWARD: 1.0, REVERSE: 1.0, SPIN_LEFT: 0.1, SPIN_RIGHT: 0.1}
 ACTION_PUSH_COST = {FORWARD: 0.8, REVERSE: 0.5, SPIN_LEFT: 0.0, SPIN_RIGHT: 0.0}
+# all action costs are multiples of 0.1, so can be represented exactly as integers in units of 1 / COST_SCALE
+COST_SCALE = 10
+# action costs in units of 1 / COST_SCALE (used when int_costs is requested from Environment.perform_action etc)
+ACTION_BASE_COST_INT = {action: round(cost * COST_SCALE) for action, cost in ACTION_BASE_COST.items()}
+ACTION_PUSH_COST_INT = {action: round(cost * COST_SCALE) for action, cost in ACTION_PUSH_COST.items()}
 
 # === Widget Types =====================================================================================================
 # Possible widget types. The type of an individual widget always stays the same.
@@ -132,6 +137,98 @@ IGNORED_SYMBOLS = [2 * c for c in string.ascii_lowercase]   # double lowercase l
 
 ALL_VALID_SYMBOLS = BEE_ORIENTATIONS + WIDGET_SYMBOLS + ENVIRONMENT_SYMBOLS + IGNORED_SYMBOLS
 
+# === Lookup Tables ====================================================================================================
+# Precomputed tables describing hex grid geometry, used to avoid branching on orientation symbols for every action.
+# Directions between adjacent cells use the same symbols as BEE orientations.
+N_DIRECTIONS = len(BEE_ORIENTATIONS)
+DIRECTION_INDEX = {d: i for i, d in enumerate(BEE_ORIENTATIONS)}
+OUT_OF_BOUNDS = -1  # sentinel cell index for positions outside the hex grid
+
+# (row, col) offset to the adjacent cell in each direction, given as (even column offset, odd column offset)
+ADJACENT_OFFSETS = {BEE_UP: ((-1, 0), (-1, 0)),
+                    BEE_DOWN: ((1, 0), (1, 0)),
+                    BEE_UP_LEFT: ((-1, -1), (0, -1)),
+                    BEE_UP_RIGHT: ((-1, 1), (0, 1)),
+                    BEE_DOWN_LEFT: ((0, -1), (1, -1)),
+                    BEE_DOWN_RIGHT: ((0, 1), (1, 1))}
+
+# direction of the adjacent cell with the given (column parity, row offset, col offset)
+OFFSET_DIRECTION = {(parity, dr, dc): d for d, offsets in ADJACENT_OFFSETS.items()
+                    for parity, (dr, dc) in enumerate(offsets)}
+
+OPPOSITE_DIRECTION = {BEE_UP: BEE_DOWN,
+                      BEE_DOWN: BEE_UP,
+                      BEE_UP_LEFT: BEE_DOWN_RIGHT,
+                      BEE_UP_RIGHT: BEE_DOWN_LEFT,
+                      BEE_DOWN_LEFT: BEE_UP_RIGHT,
+                      BEE_DOWN_RIGHT: BEE_UP_LEFT}
+
+# BEE orientation after performing each spin action
+SPIN_LEFT_ORIENT = {BEE_UP: BEE_UP_LEFT,
+                    BEE_UP_LEFT: BEE_DOWN_LEFT,
+                    BEE_DOWN_LEFT: BEE_DOWN,
+                    BEE_DOWN: BEE_DOWN_RIGHT,
+                    BEE_DOWN_RIGHT: BEE_UP_RIGHT,
+                    BEE_UP_RIGHT: BEE_UP}
+SPIN_RIGHT_ORIENT = {BEE_UP: BEE_UP_RIGHT,
+                     BEE_UP_RIGHT: BEE_DOWN_RIGHT,
+                     BEE_DOWN_RIGHT: BEE_DOWN,
+                     BEE_DOWN: BEE_DOWN_LEFT,
+                     BEE_DOWN_LEFT: BEE_UP_LEFT,
+                     BEE_UP_LEFT: BEE_UP}
+
+# direction (relative to the widget centre) of each non-centre cell occupied by a widget, for each widget type and
+# orientation
+WIDGET_ARM_DIRECTIONS = {(WIDGET3, VERTICAL): (BEE_UP, BEE_DOWN),
+                         (WIDGET3, SLANT_LEFT): (BEE_UP_LEFT, BEE_DOWN_RIGHT),
+                         (WIDGET3, SLANT_RIGHT): (BEE_UP_RIGHT, BEE_DOWN_LEFT),
+                         (WIDGET4, UP): (BEE_UP, BEE_DOWN_LEFT, BEE_DOWN_RIGHT),
+                         (WIDGET4, DOWN): (BEE_DOWN, BEE_UP_LEFT, BEE_UP_RIGHT),
+                         (WIDGET5, HORIZONTAL): (BEE_UP_LEFT, BEE_UP_RIGHT, BEE_DOWN_LEFT, BEE_DOWN_RIGHT),
+                         (WIDGET5, SLANT_LEFT): (BEE_UP, BEE_DOWN, BEE_UP_LEFT, BEE_DOWN_RIGHT),
+                         (WIDGET5, SLANT_RIGHT): (BEE_UP, BEE_DOWN, BEE_UP_RIGHT, BEE_DOWN_LEFT)}
+
+# widget orientation after being rotated, for each widget type (CW and CCW are symmetric for WIDGET4)
+WIDGET_SPIN_CW_ORIENT = {WIDGET3: {VERTICAL: SLANT_RIGHT, SLANT_RIGHT: SLANT_LEFT, SLANT_LEFT: VERTICAL},
+                         WIDGET4: {UP: DOWN, DOWN: UP},
+                         WIDGET5: {HORIZONTAL: SLANT_LEFT, SLANT_LEFT: SLANT_RIGHT, SLANT_RIGHT: HORIZONTAL}}
+WIDGET_SPIN_CCW_ORIENT = {WIDGET3: {VERTICAL: SLANT_LEFT, SLANT_LEFT: SLANT_RIGHT, SLANT_RIGHT: VERTICAL},
+                          WIDGET4: {UP: DOWN, DOWN: UP},
+                          WIDGET5: {HORIZONTAL: SLANT_RIGHT, SLANT_RIGHT: SLANT_LEFT, SLANT_LEFT: HORIZONTAL}}
+
+# movement type of a widget when the cell forward of the BEE is the widget cell in the given direction from the widget
+# centre, for each (BEE orientation, direction) pair. Pushing towards the centre translates the widget, otherwise the
+# widget is rotated.
+_SPIN_CW_PUSH_DIRECTION = {BEE_UP: BEE_DOWN_RIGHT,
+                           BEE_UP_LEFT: BEE_UP_RIGHT,
+                           BEE_DOWN_LEFT: BEE_UP,
+                           BEE_DOWN: BEE_UP_LEFT,
+                           BEE_DOWN_RIGHT: BEE_DOWN_LEFT,
+                           BEE_UP_RIGHT: BEE_DOWN}
+WIDGET_MOVE_TYPE = {(o, d): (TRANSLATE if OPPOSITE_DIRECTION[d] == o else
+                             SPIN_CW if OPPOSITE_DIRECTION[d] == _SPIN_CW_PUSH_DIRECTION[o] else
+                             SPIN_CCW)
+                    for o in BEE_ORIENTATIONS for d in BEE_ORIENTATIONS}
+
+# index-based versions of the tables above, used for packed integer states (see Environment.encode). Orientations are
+# represented by their index in BEE_ORIENTATIONS or WIDGET_ORIENTS[w_type].
+WIDGET_ORIENT_INDEX = {w_type: {ori: i for i, ori in enumerate(WIDGET_ORIENTS[w_type])} for w_type in WIDGET_TYPES}
+OPPOSITE_DIRECTION_INDEX = [DIRECTION_INDEX[OPPOSITE_DIRECTION[d]] for d in BEE_ORIENTATIONS]
+SPIN_LEFT_INDEX = [DIRECTION_INDEX[SPIN_LEFT_ORIENT[d]] for d in BEE_ORIENTATIONS]
+SPIN_RIGHT_INDEX = [DIRECTION_INDEX[SPIN_RIGHT_ORIENT[d]] for d in BEE_ORIENTATIONS]
+WIDGET_MOVE_TYPE_INDEX = [WIDGET_MOVE_TYPE[(o, d)] for o in BEE_ORIENTATIONS for d in BEE_ORIENTATIONS]
+WIDGET_ARM_DIRECTION_INDEX = {w_type: [tuple(DIRECTION_INDEX[d] for d in WIDGET_ARM_DIRECTIONS[(w_type, ori)])
+                                       for ori in WIDGET_ORIENTS[w_type]] for w_type in WIDGET_TYPES}
+WIDGET_SPIN_CW_INDEX = {w_type: [WIDGET_ORIENT_INDEX[w_type][WIDGET_SPIN_CW_ORIENT[w_type][ori]]
+                                 for ori in WIDGET_ORIENTS[w_type]] for w_type in WIDGET_TYPES}
+WIDGET_SPIN_CCW_INDEX = {w_type: [WIDGET_ORIENT_INDEX[w_type][WIDGET_SPIN_CCW_ORIENT[w_type][ori]]
+                                  for ori in WIDGET_ORIENTS[w_type]] for w_type in WIDGET_TYPES}
+# marks an unreachable entry in array-backed cost and distance tables (e.g. Environment.get_bee_nav_costs)
+UNREACHABLE = 0xFFFF
+# width of the orientation fields of a packed state
+BEE_ORIENT_BITS = 3
+WIDGET_ORIENT_BITS = 2
+
 # === Render Parameters ================================================================================================
 RENDER_CELL_TOP_WIDTH = 7
 RENDER_CELL_DEPTH = 4
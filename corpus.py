@@ -0,0 +1,142 @@
+import os
+import mmap
+import struct
+from array import array
+from environment import Environment, write_file_atomic
+
+"""
+corpus.py
+
+This file contains a class representing a level corpus, a single file containing many levels.
+
+A corpus file is a sequence of levels in the testcase file format (see README.md), where each level starts with a line
+beginning with CORPUS_LEVEL_MARKER (optionally followed by a name for the level, e.g. '#!level ex1'). Any text before the
+first marker is ignored. Since the marker starts with '#', each level is also a valid testcase file on its own.
+
+The byte offset of every level is stored in an index file next to the corpus (built on first use, and rebuilt if the
+corpus is modified), so a level can be parsed without reading any other level. The corpus is memory-mapped, so many
+worker processes can open the same corpus and each parse only the levels they are assigned.
+
+COMP3702 2024 Assignment 1 Support Code
+"""
+
+CORPUS_LEVEL_MARKER = b'#!level'
+CORPUS_INDEX_SUFFIX = '.idx'
+CORPUS_INDEX_MAGIC = b'BIDX'
+CORPUS_INDEX_VERSION = 1
+# header: magic, version, corpus file modification time (ns), corpus file size, number of levels
+CORPUS_INDEX_HEADER = struct.Struct('<4sHqqq')
+
+
+class LevelCorpus:
+    """
+    Instance of a level corpus. Levels are numbered from zero in the order they appear in the corpus file.
+    """
+
+    def __init__(self, filename):
+        """
+        Open the given corpus file, building its index file first if it does not exist or is out of date.
+
+        :param filename: name of corpus file
+        """
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        stat = os.fstat(self._file.fileno())
+        # mmap cannot map an empty file
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size > 0 else b''
+        self.offsets = self._load_index(stat)
+        if self.offsets is None:
+            self.offsets = self._build_index()
+            self._save_index(stat)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.get_environment(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.get_environment(i)
+
+    def get_level_text(self, i):
+        """
+        Return the text of the i-th level (including its marker line).
+        :param i: level number
+        :return: level text [str]
+        """
+        if not 0 <= i < len(self):
+            raise IndexError(f'level {i} out of range for corpus with {len(self)} levels')
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode()
+
+    def get_level_name(self, i):
+        """
+        Return the name given on the marker line of the i-th level (empty string if no name is given).
+        :param i: level number
+        :return: level name [str]
+        """
+        start = self.offsets[i] + len(CORPUS_LEVEL_MARKER)
+        end = self.data.find(b'\n', start, self.offsets[i + 1])
+        if end == -1:
+            end = self.offsets[i + 1]
+        return self.data[start:end].decode().strip()
+
+    def get_environment(self, i, force_valid=True):
+        """
+        Parse the i-th level and return a new Environment instance for it.
+        :param i: level number
+        :param force_valid: When creating states, raise exception if the created State violates validity constraints
+        :return: Environment instance
+        """
+        return Environment(self.get_level_text(i).splitlines(), force_valid)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    def _build_index(self):
+        offsets = array('Q')
+        if self.data[:len(CORPUS_LEVEL_MARKER)] == CORPUS_LEVEL_MARKER:
+            offsets.append(0)
+        pos = self.data.find(b'\n' + CORPUS_LEVEL_MARKER)
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = self.data.find(b'\n' + CORPUS_LEVEL_MARKER, pos + 1)
+        offsets.append(len(self.data))
+        return offsets
+
+    def _load_index(self, stat):
+        try:
+            with open(self.filename + CORPUS_INDEX_SUFFIX, 'rb') as f:
+                magic, version, mtime_ns, size, n_levels = CORPUS_INDEX_HEADER.unpack(f.read(CORPUS_INDEX_HEADER.size))
+                if (magic != CORPUS_INDEX_MAGIC or version != CORPUS_INDEX_VERSION or mtime_ns != stat.st_mtime_ns or
+                        size != stat.st_size):
+                    return None
+                offsets = array('Q')
+                offsets.fromfile(f, n_levels + 1)
+        except (OSError, struct.error, EOFError):
+            return None
+        return offsets
+
+    def _save_index(self, stat):
+        def write(f):
+            f.write(CORPUS_INDEX_HEADER.pack(CORPUS_INDEX_MAGIC, CORPUS_INDEX_VERSION, stat.st_mtime_ns, stat.st_size,
+                                             len(self)))
+            self.offsets.tofile(f)
+
+        write_file_atomic(self.filename + CORPUS_INDEX_SUFFIX, write)
+
+
+def write_corpus(filename, levels):
+    """
+    Write a corpus file containing the given levels.
+    :param filename: name of corpus file to write
+    :param levels: iterable of (name, level text) pairs, e.g. (testcase filename, contents of testcase file)
+    """
+    with open(filename, 'w') as f:
+        for name, text in levels:
+            f.write(f'{CORPUS_LEVEL_MARKER.decode()} {name}\n')
+            f.write(text)
+            if not text.endswith('\n'):
+                f.write('\n')
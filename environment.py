@@ -1,4 +1,10 @@
 import os
+import heapq
+import pickle
+import random
+import struct
+import hashlib
+from array import array
 from constants import *
 from state import State
 
@@ -11,6 +17,26 @@ class in your solver.
 COMP3702 2024 Assignment 1 Support Code
 """
 
+LEVEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'level_cache')
+LEVEL_CACHE_MAGIC = b'BLVL'
+LEVEL_CACHE_VERSION = 5
+# header: magic, version, source file modification time (ns), source file size, code digest
+LEVEL_CACHE_HEADER = struct.Struct('<4sHqq20s')
+# source files of the code which builds compiled levels - compiled levels built by different code are not reused
+LEVEL_CACHE_CODE_FILES = ('environment.py', 'constants.py', 'state.py')
+
+# seed for the Zobrist hash tables (see get_zobrist_hash), fixed so that hashes are the same in every process
+ZOBRIST_SEED = 3702
+# maximum number of BEE walks cached by each Environment (see get_bee_walk_packed)
+WALK_CACHE_SIZE = 1 << 12
+# maximum number of widget configurations whose widget moves are cached (see get_push_successors_packed)
+PUSH_MOVES_CACHE_SIZE = 1 << 15
+
+# compiled levels (pickled) already loaded by this process, keyed by (absolute path, modification time (ns), size)
+_compiled_levels = {}
+_level_cache_code_digest = None
+_terminal_colour_enabled = False
+
 
 class Environment:
     """
@@ -28,17 +54,36 @@ class Environment:
             ...         ...         ...         ...
     """
 
-    def __init__(self, filename, force_valid=True):
+    def __init__(self, filename, force_valid=True, use_cache=True):
         """
         Process the given input file and create a new game environment instance based on the input file.
 
-        :param filename: name of input file
+        The level can also be given directly as a string containing the contents of an input file, or as an iterable of
+        lines (e.g. an open file, or a level read from a corpus file, see corpus.py).
+
+        Parsing the input file and precomputing lookup tables is only performed the first time a level is loaded. The
+        result is stored as a compiled level in LEVEL_CACHE_DIR (and in memory), keyed by the input file's path and
+        modification time, and reused by later Environment instances for the same file. Levels which are not given as
+        a filename are not cached.
+
+        :param filename: name of input file, contents of input file (str containing a newline), or iterable of lines
         :param force_valid: When creating states, raise exception if the created State violates validity constraints
+        :param use_cache: if True, load the compiled level from the cache if available, and store it otherwise
         """
-        os.system('color')  # enable coloured terminal output
-
         self.force_valid = force_valid
-        f = open(filename, 'r')
+        if isinstance(filename, str) and '\n' in filename:
+            use_cache = False
+            f = filename.splitlines()
+        elif isinstance(filename, (str, os.PathLike)):
+            if use_cache:
+                compiled = load_compiled_level(filename)
+                if compiled is not None:
+                    self.__dict__.update(compiled)
+                    return
+            f = open(filename, 'r')
+        else:
+            use_cache = False
+            f = filename
 
         self.n_rows = None
         self.n_cols = None
@@ -61,8 +106,8 @@ class Environment:
         for line in f:
             line_num += 1
 
-            # skip annotations in input file
-            if line.strip()[0] == '#':
+            # skip blank lines and annotations in input file
+            if len(line.strip()) == 0 or line.strip()[0] == '#':
                 continue
 
             # read meta data
@@ -137,6 +182,92 @@ class Environment:
         self.widget_init_posits = tuple(widget_init_posits_list)
         self.widget_init_orients = tuple(widget_init_orients_list)
         self.n_widgets = len(self.widget_types)
+        # groups of widget indices sharing a widget type - widgets within a group are interchangeable (see
+        # get_canonical_key_packed)
+        self.symmetric_widget_groups = tuple(group for group in
+                                             (tuple(i for i in range(self.n_widgets) if self.widget_types[i] == w_type)
+                                              for w_type in WIDGET_TYPES) if len(group) > 1)
+
+        # precompute adjacency table over flat cell indices (index = row * n_cols + col)
+        self.n_cells = self.n_rows * self.n_cols
+        self.cell_coords = [(r, c) for r in range(self.n_rows) for c in range(self.n_cols)]
+        self.adjacent_cells = [OUT_OF_BOUNDS] * (self.n_cells * N_DIRECTIONS)
+        for idx, posit in enumerate(self.cell_coords):
+            for d, direction in enumerate(BEE_ORIENTATIONS):
+                ar, ac = get_adjacent_cell_coords(posit, direction)
+                if 0 <= ar < self.n_rows and 0 <= ac < self.n_cols:
+                    self.adjacent_cells[(idx * N_DIRECTIONS) + d] = (ar * self.n_cols) + ac
+
+        # precompute bitboards (one bit per cell index, plus a boundary bit for positions outside the hex grid)
+        # cell_bits[OUT_OF_BOUNDS] (i.e. the last element) is the boundary bit
+        self.boundary_mask = 1 << self.n_cells
+        self.cell_bits = [1 << idx for idx in range(self.n_cells)] + [self.boundary_mask]
+        self.obstacle_mask = 0
+        for idx, (r, c) in enumerate(self.cell_coords):
+            if self.obstacle_map[r][c]:
+                self.obstacle_mask |= self.cell_bits[idx]
+        self.blocked_mask = self.obstacle_mask | self.boundary_mask
+        self.target_cells = frozenset((r * self.n_cols) + c for r, c in self.target_list)
+        self.target_mask = 0
+        for idx in self.target_cells:
+            self.target_mask |= self.cell_bits[idx]
+
+        # precompute footprint of every widget placement, keyed by (widget type, centre, orientation)
+        self.widget_footprints = {}
+        self.widget_footprint_masks = {}
+        self.widget_footprint_cells = {}
+        for w_type in WIDGET_TYPES:
+            for orient in WIDGET_ORIENTS[w_type]:
+                for centre in self.cell_coords:
+                    key = (w_type, centre, orient)
+                    cells = self.widget_get_occupied_cell_indices(w_type, centre, orient)
+                    mask = 0
+                    for idx in cells:
+                        mask |= self.cell_bits[idx]
+                    self.widget_footprints[key] = cells
+                    self.widget_footprint_masks[key] = mask
+                    self.widget_footprint_cells[key] = tuple(widget_get_occupied_cells(w_type, centre, orient))
+
+        # precompute packed state layout (see encode) and footprint tables indexed by packed widget placement
+        # (centre cell index << WIDGET_ORIENT_BITS | orientation index)
+        self.cell_index_bits = max((self.n_cells - 1).bit_length(), 1)
+        self.widget_field_bits = self.cell_index_bits + WIDGET_ORIENT_BITS
+        self.widget_field_shift = BEE_ORIENT_BITS + self.cell_index_bits
+        self.n_placements = self.n_cells << WIDGET_ORIENT_BITS
+        self.placement_cells = {}
+        self.placement_masks = {}
+        for w_type in WIDGET_TYPES:
+            self.placement_cells[w_type] = [None] * self.n_placements
+            self.placement_masks[w_type] = [0] * self.n_placements
+            for orient, o in WIDGET_ORIENT_INDEX[w_type].items():
+                for idx, centre in enumerate(self.cell_coords):
+                    self.placement_cells[w_type][(idx << WIDGET_ORIENT_BITS) | o] = \
+                        self.widget_footprints[(w_type, centre, orient)]
+                    self.placement_masks[w_type][(idx << WIDGET_ORIENT_BITS) | o] = \
+                        self.widget_footprint_masks[(w_type, centre, orient)]
+
+        # Zobrist hash tables (see get_zobrist_hash) - a random 64-bit value for each BEE pose (cell index *
+        # N_DIRECTIONS + orientation index), and for each widget in each packed widget placement
+        rng = random.Random(ZOBRIST_SEED)
+        self.zobrist_BEE = array('Q', [rng.getrandbits(64) for _ in range(self.n_cells * N_DIRECTIONS)])
+        self.zobrist_widgets = [array('Q', [rng.getrandbits(64) for _ in range(self.n_placements)])
+                                for _ in range(self.n_widgets)]
+
+        # widget push distance, deadlock, BEE navigation cost and widget predecessor tables are only built if requested
+        # (see build_push_distance_tables, build_deadlock_tables, get_bee_nav_cost and get_predecessors_packed)
+        self.push_distances = None
+        self.target_index = None
+        self.reachable_targets = None
+        self.n_poses = self.n_cells * N_DIRECTIONS
+        self.bee_nav_table = None
+        self.widget_predecessors = None
+        # BEE walk move tables and cached walks (see get_bee_walk_packed) are also built when first needed
+        self.walk_moves = None
+        self.walk_cache = None
+        self.push_moves_cache = None
+
+        if use_cache:
+            save_compiled_level(filename, self)
 
     def get_init_state(self):
         """
@@ -147,208 +278,1160 @@ class Environment:
         return State(self, self.BEE_init_posit, self.BEE_init_orient, self.widget_init_posits,
                      self.widget_init_orients, self.force_valid)
 
-    def perform_action(self, state, action):
+    def perform_action(self, state, action, int_costs=False):
         """
         Perform the given action on the given state, and return whether the action was successful (i.e. valid and
         collision free), the cost of performing the action, and the resulting new state.
         :param state:
         :param action:
+        :param int_costs: if True, return the cost as an integer in units of 1 / COST_SCALE (i.e. tenths)
         :return: (successful [True/False], cost [float], next_state [instance of State])
         """
         if action == SPIN_LEFT or action == SPIN_RIGHT:
             # no collision possible for spin actions
-            cost = ACTION_BASE_COST[action]
+            cost = ACTION_BASE_COST_INT[action] if int_costs else ACTION_BASE_COST[action]
             if action == SPIN_LEFT:
-                new_orient = {BEE_UP: BEE_UP_LEFT,
-                              BEE_UP_LEFT: BEE_DOWN_LEFT,
-                              BEE_DOWN_LEFT: BEE_DOWN,
-                              BEE_DOWN: BEE_DOWN_RIGHT,
-                              BEE_DOWN_RIGHT: BEE_UP_RIGHT,
-                              BEE_UP_RIGHT: BEE_UP}[state.BEE_orient]
+                new_orient = SPIN_LEFT_ORIENT[state.BEE_orient]
             else:
-                new_orient = {BEE_UP: BEE_UP_RIGHT,
-                              BEE_UP_RIGHT: BEE_DOWN_RIGHT,
-                              BEE_DOWN_RIGHT: BEE_DOWN,
-                              BEE_DOWN: BEE_DOWN_LEFT,
-                              BEE_DOWN_LEFT: BEE_UP_LEFT,
-                              BEE_UP_LEFT: BEE_UP}[state.BEE_orient]
-            new_state = State(self, state.BEE_posit, new_orient, state.widget_centres, state.widget_orients,
-                              self.force_valid)
+                new_orient = SPIN_RIGHT_ORIENT[state.BEE_orient]
+            r, c = state.BEE_posit
+            pose = (((r * self.n_cols) + c) * N_DIRECTIONS)
+            zobrist_hash = self.get_zobrist_hash(state)
+            if zobrist_hash is not None:
+                zobrist_hash ^= (self.zobrist_BEE[pose + DIRECTION_INDEX[state.BEE_orient]] ^
+                                 self.zobrist_BEE[pose + DIRECTION_INDEX[new_orient]])
+            new_state = State._trusted(self, state.BEE_posit, new_orient, state.widget_centres, state.widget_orients,
+                                       self.force_valid, state.widget_occupancy, zobrist_hash)
             return True, cost, new_state
         else:
-            forward_direction = state.BEE_orient
-            # get coordinates of position forward of the BEE
-            forward_BEE_posit = get_adjacent_cell_coords(state.BEE_posit, forward_direction)
-            if action == FORWARD:
-                move_direction = state.BEE_orient
-                new_BEE_posit = forward_BEE_posit
+            r, c = state.BEE_posit
+            BEE_idx = (r * self.n_cols) + c
+            # get index of cell forward of the BEE
+            forward_idx = self.adjacent_cells[(BEE_idx * N_DIRECTIONS) + DIRECTION_INDEX[state.BEE_orient]]
+            occupancy = state.widget_occupancy
+            if occupancy is None:
+                occupancy = self.get_widget_occupancy(state)
+            return self._perform_move(state, action, BEE_idx, forward_idx, occupancy, int_costs)
+
+    def get_successors(self, state, lazy=False, prune_deadlocks=False, int_costs=False):
+        """
+        Return the outcome of every valid action from the given state. Work which is common to all actions (BEE cell
+        index, forward cell and widget occupancy lookup) is only performed once, making this cheaper than calling
+        perform_action for each element of BEE_ACTIONS.
+
+        :param state: current state
+        :param lazy: if True, return a generator which computes each successor on demand
+        :param prune_deadlocks: if True, omit successors which move a widget into a deadlock (see is_deadlocked)
+        :param int_costs: if True, return costs as integers in units of 1 / COST_SCALE (i.e. tenths)
+        :return: [(action, cost, next_state) for each action in BEE_ACTIONS which is successful]
+        """
+        successors = self._generate_successors(state, prune_deadlocks, int_costs)
+        if lazy:
+            return successors
+        return list(successors)
+
+    def _generate_successors(self, state, prune_deadlocks=False, int_costs=False):
+        """
+        Generator yielding (action, cost, next_state) for each successful action from the given state, in the order of
+        BEE_ACTIONS.
+        :param state: current state
+        :param prune_deadlocks: if True, skip successors which move a widget into a deadlock
+        :param int_costs: if True, yield costs as integers in units of 1 / COST_SCALE
+        """
+        r, c = state.BEE_posit
+        BEE_idx = (r * self.n_cols) + c
+        forward_idx = self.adjacent_cells[(BEE_idx * N_DIRECTIONS) + DIRECTION_INDEX[state.BEE_orient]]
+        occupancy = state.widget_occupancy
+        if occupancy is None:
+            occupancy = self.get_widget_occupancy(state)
+
+        for action in (FORWARD, REVERSE):
+            success, cost, new_state = self._perform_move(state, action, BEE_idx, forward_idx, occupancy, int_costs)
+            if success:
+                # only actions which move a widget can lead to a new deadlock
+                if prune_deadlocks and new_state.widget_occupancy is not occupancy and self.is_deadlocked(new_state):
+                    continue
+                yield action, cost, new_state
+
+        # no collision possible for spin actions
+        base_costs = ACTION_BASE_COST_INT if int_costs else ACTION_BASE_COST
+        pose = (BEE_idx * N_DIRECTIONS)
+        orient_hash = self.get_zobrist_hash(state)
+        if orient_hash is not None:
+            orient_hash ^= self.zobrist_BEE[pose + DIRECTION_INDEX[state.BEE_orient]]
+        for action, spin_orient in ((SPIN_LEFT, SPIN_LEFT_ORIENT), (SPIN_RIGHT, SPIN_RIGHT_ORIENT)):
+            new_orient = spin_orient[state.BEE_orient]
+            new_state = State._trusted(self, state.BEE_posit, new_orient, state.widget_centres, state.widget_orients,
+                                       self.force_valid, occupancy,
+                                       None if orient_hash is None else
+                                       orient_hash ^ self.zobrist_BEE[pose + DIRECTION_INDEX[new_orient]])
+            yield action, base_costs[action], new_state
+
+    def _perform_move(self, state, action, BEE_idx, forward_idx, occupancy, int_costs=False):
+        """
+        Perform a FORWARD or REVERSE action on the given state (see perform_action).
+        :param state: current state
+        :param action: FORWARD or REVERSE
+        :param BEE_idx: cell index of the BEE position
+        :param forward_idx: cell index of the cell forward of the BEE (may be OUT_OF_BOUNDS)
+        :param occupancy: widget occupancy index for the given state (see get_widget_occupancy)
+        :param int_costs: if True, return the cost as an integer in units of 1 / COST_SCALE
+        :return: (successful [True/False], cost [float], next_state [instance of State])
+        """
+        forward_direction = state.BEE_orient
+        if action == FORWARD:
+            move_direction = forward_direction
+            new_idx = forward_idx
+        else:
+            move_direction = OPPOSITE_DIRECTION[forward_direction]
+            new_idx = self.adjacent_cells[(BEE_idx * N_DIRECTIONS) + DIRECTION_INDEX[move_direction]]
+
+        # test for BEE collision with boundary or obstacle
+        new_bit = self.cell_bits[new_idx]
+        if new_bit & self.blocked_mask:
+            return False, None, None
+        new_BEE_posit = self.cell_coords[new_idx]
+        orient_idx = DIRECTION_INDEX[forward_direction]
+        zobrist_hash = self.get_zobrist_hash(state)
+        if zobrist_hash is not None:
+            zobrist_hash ^= (self.zobrist_BEE[(BEE_idx * N_DIRECTIONS) + orient_idx] ^
+                             self.zobrist_BEE[(new_idx * N_DIRECTIONS) + orient_idx])
+
+        # look up which widget (if any) occupies the new and forward positions
+        widget_index, widgets_mask, covered_targets = occupancy
+
+        # check for reversing collision
+        if action == REVERSE and new_idx in widget_index:
+            # this action causes a reversing collision with a widget
+            return False, None, None
+
+        # check if the new position moves a widget
+        i = widget_index.get(forward_idx)
+        if i is not None:
+            # this action pushes or pulls widget i
+            if int_costs:
+                cost = ACTION_BASE_COST_INT[action] + ACTION_PUSH_COST_INT[action]
             else:
-                move_direction = {BEE_UP: BEE_DOWN,
-                                  BEE_DOWN: BEE_UP,
-                                  BEE_UP_LEFT: BEE_DOWN_RIGHT,
-                                  BEE_UP_RIGHT: BEE_DOWN_LEFT,
-                                  BEE_DOWN_LEFT: BEE_UP_RIGHT,
-                                  BEE_DOWN_RIGHT: BEE_UP_LEFT}[state.BEE_orient]
-                new_BEE_posit = get_adjacent_cell_coords(state.BEE_posit, move_direction)
-
-            # test for out of bounds
-            nr, nc = new_BEE_posit
-            if (not 0 <= nr < self.n_rows) or (not 0 <= nc < self.n_cols):
-                return False, None, None
+                cost = ACTION_BASE_COST[action] + ACTION_PUSH_COST[action]
+            w_type = self.widget_types[i]
+            centre = state.widget_centres[i]
+            orient = state.widget_orients[i]
+            footprint_masks = self.widget_footprint_masks
+            cells = self.widget_footprints[(w_type, centre, orient)]
+            # cells occupied by other widgets
+            old_mask = footprint_masks[(w_type, centre, orient)]
+            others_mask = widgets_mask ^ old_mask
+
+            # get movement type - always use forward direction (cells after the centre are ordered the same as
+            # WIDGET_ARM_DIRECTIONS)
+            k = cells.index(forward_idx)
+            if k == 0:
+                widget_move_type = TRANSLATE
+            else:
+                arm_direction = WIDGET_ARM_DIRECTIONS[(w_type, orient)][k - 1]
+                widget_move_type = WIDGET_MOVE_TYPE[(forward_direction, arm_direction)]
+
+            # apply movement to the widget
+            if widget_move_type == TRANSLATE:
+                # translate widget in movement direction
+                new_centre_idx = self.adjacent_cells[(cells[0] * N_DIRECTIONS) + DIRECTION_INDEX[move_direction]]
+                if new_centre_idx == OUT_OF_BOUNDS:
+                    # new widget position is invalid - collides with boundary
+                    return False, None, None
+                new_centre = self.cell_coords[new_centre_idx]
+                new_key = (w_type, new_centre, orient)
 
-            # test for BEE collision with obstacle
-            if self.obstacle_map[nr][nc]:
-                return False, None, None
+                # test collision with boundary, obstacles and other widgets
+                new_mask = footprint_masks[new_key]
+                if new_mask & (self.blocked_mask | others_mask):
+                    return False, None, None
 
-            # check if the new position overlaps with a widget
-            widget_cells = [widget_get_occupied_cells(self.widget_types[i], state.widget_centres[i],
-                                                      state.widget_orients[i]) for i in range(self.n_widgets)]
+                # new widget position is collision free
+                new_widget_centres = tuple(state.widget_centres[j] if j != i else new_centre
+                                           for j in range(self.n_widgets))
+                new_widget_orients = state.widget_orients
+                new_field = (new_centre_idx << WIDGET_ORIENT_BITS) | WIDGET_ORIENT_INDEX[w_type][orient]
 
-            # check for reversing collision
-            for i in range(self.n_widgets):
-                if action == REVERSE and new_BEE_posit in widget_cells[i]:
-                    # this action causes a reversing collision with a widget
+            else:   # widget_move_type == SPIN_CW or widget_move_type == SPIN_CCW
+                # rotating a widget while reversing is not possible
+                if action == REVERSE:
                     return False, None, None
 
-            # check if the new position moves a widget
-            for i in range(self.n_widgets):
-                if forward_BEE_posit in widget_cells[i]:
-                    # this action pushes or pulls a widget
-                    cost = ACTION_BASE_COST[action] + ACTION_PUSH_COST[action]
-
-                    # get movement type - always use forward direction
-                    widget_move_type = widget_get_movement_type(forward_direction, forward_BEE_posit,
-                                                                state.widget_centres[i])
-
-                    # apply movement to the widget
-                    if widget_move_type == TRANSLATE:
-                        # translate widget in movement direction
-                        new_centre = get_adjacent_cell_coords(state.widget_centres[i], move_direction)
-                        new_cells = widget_get_occupied_cells(self.widget_types[i], new_centre,
-                                                              state.widget_orients[i])
-                        # test collision for each cell of the widget
-                        for (cr, cc) in new_cells:
-                            # check collision with boundary
-                            if (not 0 <= cr < self.n_rows) or (not 0 <= cc < self.n_cols):
-                                # new widget position is invalid - collides with boundary
-                                return False, None, None
-
-                            # check collision with obstacles
-                            if self.obstacle_map[cr][cc]:
-                                # new widget position is invalid - collides with an obstacle
-                                return False, None, None
-
-                            # check collision with other widgets
-                            for j in range(self.n_widgets):
-                                if j == i:
-                                    continue
-                                if (cr, cc) in widget_cells[j]:
-                                    # new widget position is invalid - collides with another widget
-                                    return False, None, None
-
-                        # new widget position is collision free
-                        new_widget_centres = tuple(state.widget_centres[j] if j != i else new_centre
-                                                   for j in range(self.n_widgets))
-                        new_state = State(self, new_BEE_posit, state.BEE_orient, new_widget_centres,
-                                          state.widget_orients, self.force_valid)
-                        return True, cost, new_state
-
-                    else:   # widget_move_type == SPIN_CW or widget_move_type == SPIN_CCW
-                        # rotating a widget while reversing is not possible
-                        if action == REVERSE:
-                            return False, None, None
-
-                        # rotate widget about its centre
-                        if self.widget_types[i] == WIDGET3:
-                            if widget_move_type == SPIN_CW:
-                                new_orient = {VERTICAL: SLANT_RIGHT,
-                                              SLANT_RIGHT: SLANT_LEFT,
-                                              SLANT_LEFT: VERTICAL}[state.widget_orients[i]]
-                            else:
-                                new_orient = {VERTICAL: SLANT_LEFT,
-                                              SLANT_LEFT: SLANT_RIGHT,
-                                              SLANT_RIGHT: VERTICAL}[state.widget_orients[i]]
-                        elif self.widget_types[i] == WIDGET4:
-                            # CW and CCW are symmetric for this case
-                            new_orient = {UP: DOWN, DOWN: UP}[state.widget_orients[i]]
-                        else:   # self.widget_types[i] == WIDGET5
-                            if widget_move_type == SPIN_CW:
-                                new_orient = {HORIZONTAL: SLANT_LEFT,
-                                              SLANT_LEFT: SLANT_RIGHT,
-                                              SLANT_RIGHT: HORIZONTAL}[state.widget_orients[i]]
-                            else:
-                                new_orient = {HORIZONTAL: SLANT_RIGHT,
-                                              SLANT_RIGHT: SLANT_LEFT,
-                                              SLANT_LEFT: HORIZONTAL}[state.widget_orients[i]]
-                        new_cells = widget_get_occupied_cells(self.widget_types[i], state.widget_centres[i], new_orient)
-
-                        # check collision with the new BEE position
-                        if new_BEE_posit in new_cells:
-                            # new widget position is invalid - collides with the BEE
-                            return False, None, None
-
-                        # test collision for each cell of the widget
-                        for (cr, cc) in new_cells:
-                            # check collision with boundary
-                            if (not 0 <= cr < self.n_rows) or (not 0 <= cc < self.n_cols):
-                                # new widget position is invalid - collides with boundary
-                                return False, None, None
-
-                            # check collision with obstacles
-                            if self.obstacle_map[cr][cc]:
-                                # new widget position is invalid - collides with an obstacle
-                                return False, None, None
-
-                            # check collision with other widgets
-                            for j in range(self.n_widgets):
-                                if j == i:
-                                    continue
-                                if (cr, cc) in widget_cells[j]:
-                                    # new widget position is invalid - collides with another widget
-                                    return False, None, None
-
-                        # new widget position is collision free
-                        new_widget_orients = tuple(state.widget_orients[j] if j != i else new_orient
-                                                   for j in range(self.n_widgets))
-                        new_state = State(self, new_BEE_posit, state.BEE_orient, state.widget_centres,
-                                          new_widget_orients, self.force_valid)
-                        return True, cost, new_state
-
-            # this action does not collide and does not push or pull any widgets
-            cost = ACTION_BASE_COST[action]
-            new_state = State(self, new_BEE_posit, state.BEE_orient, state.widget_centres,
-                              state.widget_orients, self.force_valid)
+                # rotate widget about its centre
+                if widget_move_type == SPIN_CW:
+                    new_orient = WIDGET_SPIN_CW_ORIENT[w_type][orient]
+                else:
+                    new_orient = WIDGET_SPIN_CCW_ORIENT[w_type][orient]
+                new_key = (w_type, centre, new_orient)
+
+                # test collision with the new BEE position, boundary, obstacles and other widgets
+                new_mask = footprint_masks[new_key]
+                if new_mask & (self.blocked_mask | others_mask | new_bit):
+                    return False, None, None
+
+                # new widget position is collision free
+                new_widget_centres = state.widget_centres
+                new_widget_orients = tuple(state.widget_orients[j] if j != i else new_orient
+                                           for j in range(self.n_widgets))
+                new_field = (cells[0] << WIDGET_ORIENT_BITS) | WIDGET_ORIENT_INDEX[w_type][new_orient]
+
+            # update occupancy index and covered targets for the moved widget only (widgets never overlap, so the
+            # targets covered by this widget's old position are not covered by any other widget)
+            new_widget_index = widget_index.copy()
+            for idx in cells:
+                del new_widget_index[idx]
+            for idx in self.widget_footprints[new_key]:
+                new_widget_index[idx] = i
+            new_covered_targets = (covered_targets ^ (self.target_mask & old_mask)) | (self.target_mask & new_mask)
+            new_occupancy = (new_widget_index, others_mask | new_mask, new_covered_targets)
+            old_field = (cells[0] << WIDGET_ORIENT_BITS) | WIDGET_ORIENT_INDEX[w_type][orient]
+            if zobrist_hash is not None:
+                zobrist_hash ^= self.zobrist_widgets[i][old_field] ^ self.zobrist_widgets[i][new_field]
+            new_state = State._trusted(self, new_BEE_posit, state.BEE_orient, new_widget_centres, new_widget_orients,
+                                       self.force_valid, new_occupancy, zobrist_hash)
             return True, cost, new_state
 
+        # this action does not collide and does not push or pull any widgets
+        cost = ACTION_BASE_COST_INT[action] if int_costs else ACTION_BASE_COST[action]
+        new_state = State._trusted(self, new_BEE_posit, state.BEE_orient, state.widget_centres,
+                                   state.widget_orients, self.force_valid, occupancy, zobrist_hash)
+        return True, cost, new_state
+
+    def encode(self, state):
+        """
+        Pack the given state into a single int. From the least significant bit, the fields are the BEE orientation
+        (BEE_ORIENT_BITS), the BEE cell index (cell_index_bits), then for each widget in order its orientation
+        (WIDGET_ORIENT_BITS) followed by its centre cell index (cell_index_bits).
+
+        Packed states are much smaller to store and faster to hash than State instances, and can be expanded directly
+        with perform_action_packed and get_successors_packed.
+
+        :param state: state to encode
+        :return: packed state [int]
+        """
+        key = 0
+        for i in range(self.n_widgets - 1, -1, -1):
+            cr, cc = state.widget_centres[i]
+            key = ((key << self.cell_index_bits) | (cr * self.n_cols) + cc) << WIDGET_ORIENT_BITS
+            key |= WIDGET_ORIENT_INDEX[self.widget_types[i]][state.widget_orients[i]]
+        r, c = state.BEE_posit
+        key = ((key << self.cell_index_bits) | (r * self.n_cols) + c) << BEE_ORIENT_BITS
+        return key | DIRECTION_INDEX[state.BEE_orient]
+
+    def decode(self, key):
+        """
+        Unpack a packed state (see encode) into a State instance.
+        :param key: packed state [int]
+        :return: equivalent State
+        """
+        cell_mask = (1 << self.cell_index_bits) - 1
+        BEE_orient = BEE_ORIENTATIONS[key & ((1 << BEE_ORIENT_BITS) - 1)]
+        key >>= BEE_ORIENT_BITS
+        BEE_posit = self.cell_coords[key & cell_mask]
+        key >>= self.cell_index_bits
+        widget_centres = []
+        widget_orients = []
+        for i in range(self.n_widgets):
+            widget_orients.append(WIDGET_ORIENTS[self.widget_types[i]][key & ((1 << WIDGET_ORIENT_BITS) - 1)])
+            key >>= WIDGET_ORIENT_BITS
+            widget_centres.append(self.cell_coords[key & cell_mask])
+            key >>= self.cell_index_bits
+        return State(self, BEE_posit, BEE_orient, tuple(widget_centres), tuple(widget_orients), self.force_valid)
+
+    def perform_action_packed(self, key, action, int_costs=False):
+        """
+        Equivalent of perform_action operating directly on packed states (see encode).
+        :param key: packed state [int]
+        :param action: element of BEE_ACTIONS
+        :param int_costs: if True, return the cost as an integer in units of 1 / COST_SCALE (i.e. tenths)
+        :return: (successful [True/False], cost [float], next_key [int])
+        """
+        if action == SPIN_LEFT or action == SPIN_RIGHT:
+            # no collision possible for spin actions - replace the orientation field
+            BEE_orient = key & ((1 << BEE_ORIENT_BITS) - 1)
+            new_orient = SPIN_LEFT_INDEX[BEE_orient] if action == SPIN_LEFT else SPIN_RIGHT_INDEX[BEE_orient]
+            cost = ACTION_BASE_COST_INT[action] if int_costs else ACTION_BASE_COST[action]
+            return True, cost, key ^ BEE_orient ^ new_orient
+        widget_masks, widgets_mask = self.get_widget_masks_packed(key)
+        return self._perform_move_packed(key, action, widget_masks, widgets_mask, int_costs)
+
+    def get_successors_packed(self, key, prune_deadlocks=False, int_costs=False, widget_masks=None):
+        """
+        Equivalent of get_successors operating directly on packed states (see encode).
+        :param key: packed state [int]
+        :param prune_deadlocks: if True, omit successors which move a widget into a deadlock (see is_deadlocked)
+        :param int_costs: if True, return costs as integers in units of 1 / COST_SCALE (i.e. tenths)
+        :param widget_masks: result of get_widget_masks_packed(key) (computed from key if not given)
+        :return: [(action, cost, next_key) for each action in BEE_ACTIONS which is successful]
+        """
+        successors = []
+        if widget_masks is None:
+            widget_masks = self.get_widget_masks_packed(key)
+        widget_masks, widgets_mask = widget_masks
+        widget_fields = key >> self.widget_field_shift
+        for action in (FORWARD, REVERSE):
+            success, cost, next_key = self._perform_move_packed(key, action, widget_masks, widgets_mask, int_costs)
+            if success:
+                # only actions which move a widget can lead to a new deadlock
+                if (prune_deadlocks and next_key >> self.widget_field_shift != widget_fields and
+                        self.is_deadlocked_packed(next_key)):
+                    continue
+                successors.append((action, cost, next_key))
+        BEE_orient = key & ((1 << BEE_ORIENT_BITS) - 1)
+        base_costs = ACTION_BASE_COST_INT if int_costs else ACTION_BASE_COST
+        successors.append((SPIN_LEFT, base_costs[SPIN_LEFT], key ^ BEE_orient ^ SPIN_LEFT_INDEX[BEE_orient]))
+        successors.append((SPIN_RIGHT, base_costs[SPIN_RIGHT], key ^ BEE_orient ^ SPIN_RIGHT_INDEX[BEE_orient]))
+        return successors
+
+    def get_zobrist_hash(self, state):
+        """
+        Return the 64-bit Zobrist hash of the given state, i.e. the XOR of the zobrist_BEE value for the BEE pose and
+        the zobrist_widgets value for each widget's placement. State.__hash__ returns this value, but Python reduces the
+        result of __hash__ (modulo 2^61 - 1 on 64-bit builds), so hash(state) is not always equal to it - use this
+        function when the full 64-bit hash is needed.
+
+        The hash is stored in the state when first computed. States created by perform_action and get_successors
+        receive their hash by updating the hash of the parent state for only the parts which changed.
+
+        States constructed without validity checks may have a position outside the grid (or an invalid orientation or
+        number of widgets), and have no Zobrist hash - State.__hash__ falls back to hashing the state's fields for these.
+
+        :param state: State instance
+        :return: Zobrist hash [int], or None if the state has no Zobrist hash
+        """
+        zobrist_hash = state._hash
+        if zobrist_hash is None:
+            BEE_idx = self._grid_index(state.BEE_posit)
+            orient_idx = DIRECTION_INDEX.get(state.BEE_orient)
+            if BEE_idx is None or orient_idx is None or len(state.widget_centres) != self.n_widgets or \
+                    len(state.widget_orients) != self.n_widgets:
+                return None
+            zobrist_hash = self.zobrist_BEE[(BEE_idx * N_DIRECTIONS) + orient_idx]
+            for i in range(self.n_widgets):
+                centre_idx = self._grid_index(state.widget_centres[i])
+                w_orient_idx = WIDGET_ORIENT_INDEX[self.widget_types[i]].get(state.widget_orients[i])
+                if centre_idx is None or w_orient_idx is None:
+                    return None
+                zobrist_hash ^= self.zobrist_widgets[i][(centre_idx << WIDGET_ORIENT_BITS) | w_orient_idx]
+            state._hash = zobrist_hash
+        return zobrist_hash
+
+    def _grid_index(self, posit):
+        """
+        Return the cell index of the given position, or None if it is not a pair of integers inside the grid.
+        :param posit: (row, col) position
+        :return: cell index, or None
+        """
+        r, c = posit
+        if isinstance(r, int) and isinstance(c, int) and 0 <= r < self.n_rows and 0 <= c < self.n_cols:
+            return (r * self.n_cols) + c
+        return None
+
+    def get_zobrist_hash_packed(self, key):
+        """
+        Return the Zobrist hash of the given packed state (see get_zobrist_hash). This is equal to the Zobrist hash of
+        decode(key), and unlike hash(key) is well distributed in its low bits (e.g. for assigning states to workers).
+        :param key: packed state [int]
+        :return: Zobrist hash [int]
+        """
+        zobrist_hash = self.zobrist_BEE[((((key >> BEE_ORIENT_BITS) & ((1 << self.cell_index_bits) - 1)) *
+                                          N_DIRECTIONS) + (key & ((1 << BEE_ORIENT_BITS) - 1)))]
+        field_mask = (1 << self.widget_field_bits) - 1
+        key >>= self.widget_field_shift
+        for table in self.zobrist_widgets:
+            zobrist_hash ^= table[key & field_mask]
+            key >>= self.widget_field_bits
+        return zobrist_hash
+
+    def get_canonical_key_packed(self, key):
+        """
+        Return the canonical form of the given packed state, where the widget fields within each group of widgets of
+        the same type (see symmetric_widget_groups) are sorted. States which differ only by swapping widgets of the
+        same type are physically identical (targets do not care which widget covers them), so they have the same
+        canonical form, and any sequence of actions has the same effect on each of them.
+
+        Canonical keys are intended for duplicate detection only - widget indices in a canonical key may not match the
+        widget indices of the original state, so canonical keys should not be decoded for display to the tester.
+
+        :param key: packed state [int]
+        :return: canonical packed state [int] (equal to key if the level has no interchangeable widgets)
+        """
+        field_mask = (1 << self.widget_field_bits) - 1
+        for group in self.symmetric_widget_groups:
+            shifts = [self.widget_field_shift + (i * self.widget_field_bits) for i in group]
+            fields = sorted((key >> shift) & field_mask for shift in shifts)
+            for shift, field in zip(shifts, fields):
+                key = (key & ~(field_mask << shift)) | (field << shift)
+        return key
+
+    def get_canonical_key(self, state):
+        """
+        Return the canonical packed form of the given state (see get_canonical_key_packed).
+        :param state: State instance
+        :return: canonical packed state [int]
+        """
+        return self.get_canonical_key_packed(self.encode(state))
+
+    def is_solved_packed(self, key, widgets_mask=None):
+        """
+        Equivalent of is_solved operating directly on packed states (see encode). Given the bitboard of all widget
+        cells, this is a single comparison, as for is_solved.
+        :param key: packed state [int]
+        :param widgets_mask: bitboard of all cells occupied by widgets (computed from key if not given, see
+            get_widget_masks_packed)
+        :return: True if solved, False otherwise
+        """
+        if widgets_mask is None:
+            widgets_mask = self.get_widget_masks_packed(key)[1]
+        return self.target_mask & widgets_mask == self.target_mask
+
+    def get_predecessors(self, state, int_costs=False):
+        """
+        Return every (action, cost, prev_state) such that performing action on prev_state is successful and results in
+        the given state (i.e. the reverse of get_successors).
+        :param state: current state
+        :param int_costs: if True, return costs as integers in units of 1 / COST_SCALE (i.e. tenths)
+        :return: [(action, cost, prev_state) for each predecessor]
+        """
+        return [(action, cost, self.decode(prev_key))
+                for action, cost, prev_key in self.get_predecessors_packed(self.encode(state), int_costs)]
+
+    def get_predecessors_packed(self, key, int_costs=False):
+        """
+        Equivalent of get_predecessors operating directly on packed states (see encode).
+
+        A FORWARD or REVERSE action always moves the BEE exactly one cell and moves at most one widget, so candidate
+        predecessors are found by moving the BEE back one cell, and optionally moving one widget back to a placement it
+        can be pushed, pulled or rotated from (see get_single_widget_graph). Each candidate is confirmed by performing
+        the action on it, since whether the widget moves (and how) depends on which cell of the widget the BEE pushes.
+
+        :param key: packed state [int]
+        :param int_costs: if True, return costs as integers in units of 1 / COST_SCALE (i.e. tenths)
+        :return: [(action, cost, prev_key) for each predecessor]
+        """
+        if self.widget_predecessors is None:
+            self.widget_predecessors = {w_type: self.get_single_widget_graph(w_type)[1]
+                                        for w_type in set(self.widget_types)}
+
+        # spins can always be undone by the opposite spin
+        BEE_orient = key & ((1 << BEE_ORIENT_BITS) - 1)
+        base_costs = ACTION_BASE_COST_INT if int_costs else ACTION_BASE_COST
+        predecessors = [(SPIN_LEFT, base_costs[SPIN_LEFT], key ^ BEE_orient ^ SPIN_RIGHT_INDEX[BEE_orient]),
+                        (SPIN_RIGHT, base_costs[SPIN_RIGHT], key ^ BEE_orient ^ SPIN_LEFT_INDEX[BEE_orient])]
+
+        BEE_idx = (key >> BEE_ORIENT_BITS) & ((1 << self.cell_index_bits) - 1)
+        widget_masks, widgets_mask = self.get_widget_masks_packed(key)
+        field_mask = (1 << self.widget_field_bits) - 1
+        for action in (FORWARD, REVERSE):
+            # FORWARD moved the BEE in the direction it is facing, REVERSE moved it in the opposite direction
+            prev_direction = OPPOSITE_DIRECTION_INDEX[BEE_orient] if action == FORWARD else BEE_orient
+            prev_idx = self.adjacent_cells[(BEE_idx * N_DIRECTIONS) + prev_direction]
+            prev_bit = self.cell_bits[prev_idx]
+            if prev_bit & self.blocked_mask:
+                continue
+            prev_key = key ^ ((BEE_idx ^ prev_idx) << BEE_ORIENT_BITS)
+
+            # candidates: no widget moved, or widget i moved from one of its predecessor placements
+            candidates = []
+            if not prev_bit & widgets_mask:
+                candidates.append(prev_key)
+            for i, w_type in enumerate(self.widget_types):
+                shift = self.widget_field_shift + (i * self.widget_field_bits)
+                field = (key >> shift) & field_mask
+                # prev_field placement must not overlap the BEE, obstacles or the other widgets
+                blocked_mask = self.blocked_mask | prev_bit | (widgets_mask ^ widget_masks[i])
+                for prev_field in self.widget_predecessors[w_type][field]:
+                    if not self.placement_masks[w_type][prev_field] & blocked_mask:
+                        candidates.append(prev_key ^ ((field ^ prev_field) << shift))
+
+            for candidate in candidates:
+                success, cost, next_key = self.perform_action_packed(candidate, action, int_costs)
+                if success and next_key == key:
+                    predecessors.append((action, cost, candidate))
+        return predecessors
+
+    def get_goal_states_packed(self):
+        """
+        Generate every valid solved state, as packed states (see encode). Widget placements are enumerated with
+        pruning, but all valid BEE positions and orientations are included for each widget configuration, so this can
+        be very large for levels where the widgets have many more cells than there are targets.
+        :return: generator of packed states
+        """
+        valid = {w_type: self.get_single_widget_graph(w_type)[0] for w_type in set(self.widget_types)}
+        # number of cells covered by widgets after widget i (the widget type is the number of cells it covers)
+        remaining_capacity = [sum(int(w_type) for w_type in self.widget_types[i + 1:]) for i in range(self.n_widgets)]
+
+        def widget_configurations(i, fields, widgets_mask):
+            if i == self.n_widgets:
+                yield fields, widgets_mask
+                return
+            w_type = self.widget_types[i]
+            for p in valid[w_type]:
+                mask = self.placement_masks[w_type][p]
+                if mask & widgets_mask:
+                    continue
+                # skip if the remaining widgets cannot cover all remaining targets
+                if bin(self.target_mask & ~(widgets_mask | mask)).count('1') > remaining_capacity[i]:
+                    continue
+                yield from widget_configurations(i + 1, fields | (p << (i * self.widget_field_bits)),
+                                                 widgets_mask | mask)
+
+        for fields, widgets_mask in widget_configurations(0, 0, 0):
+            for idx in range(self.n_cells):
+                if not self.cell_bits[idx] & (self.blocked_mask | widgets_mask):
+                    for orient in range(N_DIRECTIONS):
+                        yield (fields << self.widget_field_shift) | (idx << BEE_ORIENT_BITS) | orient
+
+    def get_goal_states(self):
+        """
+        Generate every valid solved state (see get_goal_states_packed).
+        :return: generator of states
+        """
+        for key in self.get_goal_states_packed():
+            yield self.decode(key)
+
+    def build_push_distance_tables(self):
+        """
+        Precompute, for each widget type present in this level, the minimum number of widget moves (pushes, pulls and
+        rotations) needed to move the widget from each placement to a placement which covers each target. Distances are
+        computed by a backwards breadth first search from the target-covering placements, using the same push, pull and
+        rotation rules as perform_action. Only a single widget is considered at a time, and whether the BEE can reach
+        the cell it needs to push from is ignored, so each distance is a lower bound (useful for admissible heuristics).
+
+        The result is stored in push_distances[w_type][(t * n_placements) + placement], where t is the index of the
+        target in target_list (target_index maps each target to t) and placement = (centre index <<
+        WIDGET_ORIENT_BITS) | orient index. Entries are UNREACHABLE where the target can never be covered.
+        """
+        if self.push_distances is not None:
+            return
+        self.target_index = {target: t for t, target in enumerate(self.target_list)}
+        self.push_distances = {}
+        for w_type in set(self.widget_types):
+            placement_masks = self.placement_masks[w_type]
+            valid, predecessors = self.get_single_widget_graph(w_type)
+
+            # search backwards from the placements covering each target
+            distances = array('H', [UNREACHABLE]) * (len(self.target_list) * self.n_placements)
+            for t, (tr, tc) in enumerate(self.target_list):
+                tgt_bit = self.cell_bits[(tr * self.n_cols) + tc]
+                offset = t * self.n_placements
+                frontier = [p for p in valid if placement_masks[p] & tgt_bit]
+                for p in frontier:
+                    distances[offset + p] = 0
+                dist = 0
+                while frontier:
+                    dist += 1
+                    next_frontier = []
+                    for p in frontier:
+                        for prev_p in predecessors[p]:
+                            if distances[offset + prev_p] == UNREACHABLE:
+                                distances[offset + prev_p] = dist
+                                next_frontier.append(prev_p)
+                    frontier = next_frontier
+            self.push_distances[w_type] = distances
+
+    def get_push_distance(self, w_type, centre, orient, target):
+        """
+        Return the minimum number of widget moves needed for a widget with the given type, centre and orientation to
+        cover the given target cell (see build_push_distance_tables).
+        :param w_type: widget type
+        :param centre: (row, col) centre point of the widget
+        :param orient: orientation of the widget
+        :param target: (row, col) of an element of target_list
+        :return: number of widget moves [int], or None if the widget can never cover the target
+        """
+        if self.push_distances is None:
+            self.build_push_distance_tables()
+        r, c = centre
+        placement = (((r * self.n_cols) + c) << WIDGET_ORIENT_BITS) | WIDGET_ORIENT_INDEX[w_type][orient]
+        dist = self.push_distances[w_type][(self.target_index[target] * self.n_placements) + placement]
+        if dist == UNREACHABLE:
+            return None
+        return dist
+
+    def build_deadlock_tables(self):
+        """
+        Precompute, for each widget type present in this level and each placement of that widget, the bitboard of
+        targets which the widget could be moved to cover starting from that placement (derived from the push distance
+        tables, see build_push_distance_tables). As the push distances are a relaxation of the real problem, any
+        placement which can never cover a target (e.g. a widget jammed against a wall) is guaranteed to be dead.
+
+        Called automatically the first time a deadlock lookup is performed. The result is stored in
+        reachable_targets[w_type][placement], where placement = (centre index << WIDGET_ORIENT_BITS) | orient index.
+        """
+        if self.reachable_targets is not None:
+            return
+        if self.push_distances is None:
+            self.build_push_distance_tables()
+        self.reachable_targets = {}
+        for w_type, distances in self.push_distances.items():
+            reachable = [0] * self.n_placements
+            for t, (tr, tc) in enumerate(self.target_list):
+                tgt_bit = self.cell_bits[(tr * self.n_cols) + tc]
+                offset = t * self.n_placements
+                for p in range(self.n_placements):
+                    if distances[offset + p] != UNREACHABLE:
+                        reachable[p] |= tgt_bit
+            self.reachable_targets[w_type] = reachable
+
+    def get_single_widget_graph(self, w_type):
+        """
+        Return the reverse transition graph for a lone widget of the given type, i.e. for each placement, the
+        placements from which the widget can be pushed, pulled or rotated into it (see _single_widget_moves).
+        :param w_type: widget type
+        :return: ([valid placements, i.e. inside the hex grid and not overlapping an obstacle],
+                  [list of predecessor placements for each placement])
+        """
+        placement_masks = self.placement_masks[w_type]
+        valid = [p for p in range(self.n_placements)
+                 if self.placement_cells[w_type][p] is not None and not placement_masks[p] & self.blocked_mask]
+        predecessors = [[] for _ in range(self.n_placements)]
+        for p in valid:
+            for next_p in self._single_widget_moves(w_type, p):
+                predecessors[next_p].append(p)
+        return valid, predecessors
+
+    def _single_widget_moves(self, w_type, placement):
+        """
+        Return the placements a lone widget can be pushed, pulled or rotated into from the given placement, from any
+        BEE position which is inside the hex grid and not an obstacle.
+        :param w_type: widget type
+        :param placement: packed widget placement (centre index << WIDGET_ORIENT_BITS | orient index)
+        :return: set of packed widget placements
+        """
+        placement_masks = self.placement_masks[w_type]
+        centre_idx = placement >> WIDGET_ORIENT_BITS
+        w_orient = placement & ((1 << WIDGET_ORIENT_BITS) - 1)
+        widget_mask = placement_masks[placement]
+        next_placements = set()
+        for k, forward_idx in enumerate(self.placement_cells[w_type][placement]):
+            for BEE_orient in range(N_DIRECTIONS):
+                # BEE is behind the forward cell, facing the widget
+                reverse_direction = OPPOSITE_DIRECTION_INDEX[BEE_orient]
+                BEE_idx = self.adjacent_cells[(forward_idx * N_DIRECTIONS) + reverse_direction]
+                if self.cell_bits[BEE_idx] & (self.blocked_mask | widget_mask):
+                    continue
+                if k == 0:
+                    widget_move_type = TRANSLATE
+                else:
+                    arm_direction = WIDGET_ARM_DIRECTION_INDEX[w_type][w_orient][k - 1]
+                    widget_move_type = WIDGET_MOVE_TYPE_INDEX[(BEE_orient * N_DIRECTIONS) + arm_direction]
+
+                if widget_move_type == TRANSLATE:
+                    # push forward
+                    new_centre_idx = self.adjacent_cells[(centre_idx * N_DIRECTIONS) + BEE_orient]
+                    if new_centre_idx != OUT_OF_BOUNDS:
+                        new_p = (new_centre_idx << WIDGET_ORIENT_BITS) | w_orient
+                        if not placement_masks[new_p] & self.blocked_mask:
+                            next_placements.add(new_p)
+                    # pull in reverse
+                    new_BEE_idx = self.adjacent_cells[(BEE_idx * N_DIRECTIONS) + reverse_direction]
+                    new_centre_idx = self.adjacent_cells[(centre_idx * N_DIRECTIONS) + reverse_direction]
+                    if not self.cell_bits[new_BEE_idx] & (self.blocked_mask | widget_mask) and \
+                            new_centre_idx != OUT_OF_BOUNDS:
+                        new_p = (new_centre_idx << WIDGET_ORIENT_BITS) | w_orient
+                        if not placement_masks[new_p] & self.blocked_mask:
+                            next_placements.add(new_p)
+                else:
+                    # rotate forward (rotating in reverse is not possible)
+                    if widget_move_type == SPIN_CW:
+                        new_p = (centre_idx << WIDGET_ORIENT_BITS) | WIDGET_SPIN_CW_INDEX[w_type][w_orient]
+                    else:
+                        new_p = (centre_idx << WIDGET_ORIENT_BITS) | WIDGET_SPIN_CCW_INDEX[w_type][w_orient]
+                    if not placement_masks[new_p] & (self.blocked_mask | self.cell_bits[forward_idx]):
+                        next_placements.add(new_p)
+        return next_placements
+
+    def is_dead_placement(self, w_type, centre, orient):
+        """
+        Check whether a widget with the given type, centre and orientation can never be moved to cover any target (see
+        build_deadlock_tables).
+        :param w_type: widget type
+        :param centre: (row, col) centre point of the widget
+        :param orient: orientation of the widget
+        :return: True if the placement is dead, False otherwise
+        """
+        if self.reachable_targets is None:
+            self.build_deadlock_tables()
+        r, c = centre
+        placement = (((r * self.n_cols) + c) << WIDGET_ORIENT_BITS) | WIDGET_ORIENT_INDEX[w_type][orient]
+        return self.reachable_targets[w_type][placement] == 0
+
+    def is_deadlocked(self, state):
+        """
+        Check whether the given state can never be solved because some target cannot be reached by any widget from its
+        current placement (see build_deadlock_tables). Returns False for states which may still be solvable.
+        :param state: current state
+        :return: True if the state is a deadlock, False otherwise
+        """
+        if self.reachable_targets is None:
+            self.build_deadlock_tables()
+        reachable = 0
+        for i in range(self.n_widgets):
+            w_type = self.widget_types[i]
+            r, c = state.widget_centres[i]
+            placement = (((r * self.n_cols) + c) << WIDGET_ORIENT_BITS) | \
+                WIDGET_ORIENT_INDEX[w_type][state.widget_orients[i]]
+            reachable |= self.reachable_targets[w_type][placement]
+        return reachable != self.target_mask
+
+    def is_deadlocked_packed(self, key):
+        """
+        Equivalent of is_deadlocked operating directly on packed states (see encode).
+        :param key: packed state [int]
+        :return: True if the state is a deadlock, False otherwise
+        """
+        if self.reachable_targets is None:
+            self.build_deadlock_tables()
+        field_mask = (1 << self.widget_field_bits) - 1
+        key >>= self.widget_field_shift
+        reachable = 0
+        for w_type in self.widget_types:
+            reachable |= self.reachable_targets[w_type][key & field_mask]
+            key >>= self.widget_field_bits
+        return reachable != self.target_mask
+
+    def get_pose(self, BEE_posit, BEE_orient):
+        """
+        Return the pose index for the given BEE position and orientation, as used by the BEE navigation cost tables.
+        The pose index is cell index * N_DIRECTIONS + orientation index (the same as the adjacency table index, so
+        adjacent_cells[pose] is the cell forward of the BEE).
+        :param BEE_posit: (row, col) BEE position
+        :param BEE_orient: element of BEE_ORIENTATIONS
+        :return: pose index
+        """
+        r, c = BEE_posit
+        return (((r * self.n_cols) + c) * N_DIRECTIONS) + DIRECTION_INDEX[BEE_orient]
+
+    def get_bee_nav_costs(self, sources):
+        """
+        Compute the cheapest cost for the BEE to travel from any of the given source poses to every pose, using
+        multi-source Dijkstra. Obstacles are treated as static and widgets are ignored, so each cost is a lower bound on
+        the true cost of moving the BEE when widgets are present.
+
+        Every BEE move can be undone by the opposite move at the same cost, so this is also the cheapest cost from each
+        pose to the nearest source.
+
+        :param sources: iterable of pose indices (see get_pose)
+        :return: array('H') of costs in units of 1 / COST_SCALE for each pose (UNREACHABLE if unreachable)
+        """
+        move_cost = round(ACTION_BASE_COST[FORWARD] * COST_SCALE)
+        spin_cost = round(ACTION_BASE_COST[SPIN_LEFT] * COST_SCALE)
+        costs = array('H', [UNREACHABLE]) * self.n_poses
+        heap = []
+        for pose in sources:
+            if not self.cell_bits[pose // N_DIRECTIONS] & self.obstacle_mask and costs[pose] != 0:
+                costs[pose] = 0
+                heap.append((0, pose))
+        heapq.heapify(heap)
+
+        while heap:
+            cost, pose = heapq.heappop(heap)
+            if cost > costs[pose]:
+                continue
+            cell, orient = divmod(pose, N_DIRECTIONS)
+            base = cell * N_DIRECTIONS
+            neighbours = [(base + SPIN_LEFT_INDEX[orient], cost + spin_cost),
+                          (base + SPIN_RIGHT_INDEX[orient], cost + spin_cost)]
+            for direction in (orient, OPPOSITE_DIRECTION_INDEX[orient]):
+                next_cell = self.adjacent_cells[base + direction]
+                if not self.cell_bits[next_cell] & self.blocked_mask:
+                    neighbours.append(((next_cell * N_DIRECTIONS) + orient, cost + move_cost))
+            for next_pose, next_cost in neighbours:
+                if next_cost < costs[next_pose]:
+                    costs[next_pose] = next_cost
+                    heapq.heappush(heap, (next_cost, next_pose))
+        return costs
+
+    def get_bee_nav_cost(self, from_pose, to_pose):
+        """
+        Return the cheapest BEE-only cost between two poses (see get_bee_nav_costs). Results are stored in a table of rows
+        (bee_nav_table, indexed by from_pose then to_pose), where each row is computed the first time it is needed, so
+        only the rows for poses which are actually queried are kept in memory.
+        :param from_pose: pose index (see get_pose)
+        :param to_pose: pose index
+        :return: cost [float], or None if to_pose is unreachable from from_pose
+        """
+        if self.bee_nav_table is None:
+            self.bee_nav_table = [None] * self.n_poses
+        row = self.bee_nav_table[from_pose]
+        if row is None:
+            row = self.get_bee_nav_costs((from_pose,))
+            self.bee_nav_table[from_pose] = row
+        cost = row[to_pose]
+        if cost == UNREACHABLE:
+            return None
+        return cost / COST_SCALE
+
+    def get_push_successors_packed(self, key, prune_deadlocks=False):
+        """
+        Return every state reachable from the given packed state by moving the BEE without disturbing any widget (see
+        get_bee_walk_packed), then performing a single FORWARD or REVERSE action which pushes, pulls or rotates a
+        widget.
+
+        Each result is a macro action made up of a walk followed by one widget move. Searching over these macro actions
+        instead of BEE_ACTIONS skips every state between widget moves, while the cost of each macro action is the
+        cheapest cost of its primitive actions, so a lowest cost path is still found. The widget moves of each widget
+        configuration (see _get_push_moves_packed) are cached, as many search nodes share the same widget positions.
+        The walk depends on the BEE pose too, so it is recomputed for each search node. This makes each call much more
+        expensive than get_successors_packed.
+
+        :param key: packed state [int]
+        :param prune_deadlocks: if True, omit successors which move a widget into a deadlock (see is_deadlocked)
+        :return: [(pre_push_key, action, cost, next_key)] for each widget move, where pre_push_key is the packed state
+            immediately before the widget move, action is FORWARD or REVERSE, and cost is the total cost of the walk and
+            widget move in units of 1 / COST_SCALE
+        """
+        if self.push_moves_cache is None:
+            self.push_moves_cache = ({}, {})
+        widget_key = (key >> self.widget_field_shift) << self.widget_field_shift
+        cache = self.push_moves_cache[bool(prune_deadlocks)]
+        moves = cache.get(widget_key)
+        if moves is None:
+            moves = self._get_push_moves_packed(widget_key, prune_deadlocks)
+            if len(cache) >= PUSH_MOVES_CACHE_SIZE:
+                cache.clear()
+            cache[widget_key] = moves
+        walk_costs = self.get_bee_walk_packed(key)[1]
+        return [(pre_push_key, action, walk_costs[pose] + cost, next_key)
+                for pose, pre_push_key, action, cost, next_key in moves if walk_costs[pose] != UNREACHABLE]
+
+    def _get_push_moves_packed(self, widget_key, prune_deadlocks=False):
+        """
+        Return every widget move (FORWARD or REVERSE action from a pose facing a widget) possible for the widget
+        positions of the given packed state, regardless of whether the BEE can walk to the pose (see
+        get_push_successors_packed). These depend only on the widget positions, so are cached per widget configuration.
+        :param widget_key: packed state [int] (the BEE pose is ignored)
+        :param prune_deadlocks: if True, omit moves which move a widget into a deadlock (see is_deadlocked)
+        :return: [(pose, pre_push_key, action, cost, next_key)] where cost is the cost of the widget move in units of
+            1 / COST_SCALE
+        """
+        widget_masks, widgets_mask = self.get_widget_masks_packed(widget_key)
+        widget_key = (widget_key >> self.widget_field_shift) << self.widget_field_shift
+        cell_bits = self.cell_bits
+        adjacent_cells = self.adjacent_cells
+        occupied_mask = self.blocked_mask | widgets_mask
+        moves = []
+        for pose in range(self.n_poses):
+            cell, orient = divmod(pose, N_DIRECTIONS)
+            # only poses facing a widget can move a widget
+            if cell_bits[cell] & occupied_mask or not cell_bits[adjacent_cells[pose]] & widgets_mask:
+                continue
+            pre_push_key = widget_key | (cell << BEE_ORIENT_BITS) | orient
+            for action in (FORWARD, REVERSE):
+                success, cost, next_key = self._perform_move_packed(pre_push_key, action, widget_masks, widgets_mask,
+                                                                    int_costs=True)
+                if not success or (prune_deadlocks and self.is_deadlocked_packed(next_key)):
+                    continue
+                moves.append((pose, pre_push_key, action, cost, next_key))
+        return moves
+
+    def get_bee_walk_packed(self, key, widgets_mask=None):
+        """
+        Compute the cheapest cost for the BEE to reach every pose (see get_pose) from its pose in the given packed state
+        without moving any widget, using Dijkstra. Unlike get_bee_nav_costs, widgets are treated as obstacles, and
+        FORWARD or REVERSE actions from a pose facing a widget are excluded (as these push or pull the widget).
+
+        The result depends only on the packed state (the widget positions and the BEE pose), so the results for up to
+        WALK_CACHE_SIZE packed states are cached, and the returned arrays must not be modified.
+
+        :param key: packed state [int]
+        :param widgets_mask: bitboard of all cells occupied by widgets (computed from key if not given)
+        :return: (poses, costs, prev_poses, prev_actions) where poses lists every reachable pose in order of cost, costs
+            is an array of the cost of each pose in units of 1 / COST_SCALE (UNREACHABLE if unreachable), and
+            prev_poses and prev_actions hold the previous pose and action of each reachable pose other than the start
+            pose (prev_poses is -1 for the start pose and unreachable poses)
+        """
+        if self.walk_cache is None:
+            self.walk_cache = {}
+            self._build_walk_moves()
+        walk = self.walk_cache.get(key)
+        if walk is not None:
+            return walk
+        if widgets_mask is None:
+            widgets_mask = self.get_widget_masks_packed(key)[1]
+        spin_left, spin_right, forward_cells, forward_poses, reverse_cells, reverse_poses = self.walk_moves
+        cell_bits = self.cell_bits
+        move_cost = ACTION_BASE_COST_INT[FORWARD]
+        spin_cost = ACTION_BASE_COST_INT[SPIN_LEFT]
+        start = (((key >> BEE_ORIENT_BITS) & ((1 << self.cell_index_bits) - 1)) * N_DIRECTIONS) + \
+            (key & ((1 << BEE_ORIENT_BITS) - 1))
+
+        costs = array('H', [UNREACHABLE]) * self.n_poses
+        prev_poses = array('l', [-1]) * self.n_poses
+        prev_actions = bytearray(self.n_poses)
+        poses = []
+        costs[start] = 0
+        # bucket queue of poses (as in search.BucketQueue, inlined to avoid a method call per pose) - each step costs at
+        # most move_cost, so buckets up to move_cost above the current cost are kept allocated
+        buckets = [[start]] + [[] for _ in range(move_cost)]
+        n_pending = 1
+        cost = 0
+        while n_pending:
+            bucket = buckets[cost]
+            n_pending -= len(bucket)
+            for pose in bucket:
+                if costs[pose] != cost:
+                    # stale entry, a cheaper path to this pose was found after this entry was pushed
+                    continue
+                poses.append(pose)
+                next_cost = cost + spin_cost
+                next_pose = spin_left[pose]
+                if next_cost < costs[next_pose]:
+                    costs[next_pose] = next_cost
+                    prev_poses[next_pose] = pose
+                    prev_actions[next_pose] = SPIN_LEFT
+                    buckets[next_cost].append(next_pose)
+                    n_pending += 1
+                next_pose = spin_right[pose]
+                if next_cost < costs[next_pose]:
+                    costs[next_pose] = next_cost
+                    prev_poses[next_pose] = pose
+                    prev_actions[next_pose] = SPIN_RIGHT
+                    buckets[next_cost].append(next_pose)
+                    n_pending += 1
+                if cell_bits[forward_cells[pose]] & widgets_mask:
+                    continue
+                next_cost = cost + move_cost
+                next_pose = forward_poses[pose]
+                if next_pose >= 0 and next_cost < costs[next_pose]:
+                    costs[next_pose] = next_cost
+                    prev_poses[next_pose] = pose
+                    prev_actions[next_pose] = FORWARD
+                    buckets[next_cost].append(next_pose)
+                    n_pending += 1
+                next_pose = reverse_poses[pose]
+                if next_pose >= 0 and next_cost < costs[next_pose] and \
+                        not cell_bits[reverse_cells[pose]] & widgets_mask:
+                    costs[next_pose] = next_cost
+                    prev_poses[next_pose] = pose
+                    prev_actions[next_pose] = REVERSE
+                    buckets[next_cost].append(next_pose)
+                    n_pending += 1
+            buckets.append([])
+            cost += 1
+
+        walk = (poses, costs, prev_poses, prev_actions)
+        if len(self.walk_cache) >= WALK_CACHE_SIZE:
+            self.walk_cache.clear()
+        self.walk_cache[key] = walk
+        return walk
+
+    def _build_walk_moves(self):
+        """
+        Build the tables of BEE moves used by get_bee_walk_packed, indexed by pose: the pose after SPIN_LEFT and
+        SPIN_RIGHT, the cell forward of the BEE and the pose after FORWARD, and the cell behind the BEE and the pose
+        after REVERSE (-1 if the move is blocked by an obstacle or the boundary).
+        """
+        spin_left = array('l', [0]) * self.n_poses
+        spin_right = array('l', [0]) * self.n_poses
+        forward_cells = array('l', [0]) * self.n_poses
+        forward_poses = array('l', [-1]) * self.n_poses
+        reverse_cells = array('l', [0]) * self.n_poses
+        reverse_poses = array('l', [-1]) * self.n_poses
+        for pose in range(self.n_poses):
+            orient = pose % N_DIRECTIONS
+            base = pose - orient
+            spin_left[pose] = base + SPIN_LEFT_INDEX[orient]
+            spin_right[pose] = base + SPIN_RIGHT_INDEX[orient]
+            forward_cells[pose] = self.adjacent_cells[pose]
+            if not self.cell_bits[forward_cells[pose]] & self.blocked_mask:
+                forward_poses[pose] = (forward_cells[pose] * N_DIRECTIONS) + orient
+            reverse_cells[pose] = self.adjacent_cells[base + OPPOSITE_DIRECTION_INDEX[orient]]
+            if not self.cell_bits[reverse_cells[pose]] & self.blocked_mask:
+                reverse_poses[pose] = (reverse_cells[pose] * N_DIRECTIONS) + orient
+        self.walk_moves = (spin_left, spin_right, forward_cells, forward_poses, reverse_cells, reverse_poses)
+
+    def get_bee_walk_actions_packed(self, key, to_key):
+        """
+        Return a cheapest list of actions which moves the BEE from its pose in key to its pose in to_key without moving
+        any widget (see get_bee_walk_packed). Both packed states must have the same widget positions.
+        :param key: packed state [int]
+        :param to_key: packed state [int]
+        :return: list of actions (elements of BEE_ACTIONS), or None if the BEE cannot reach the pose in to_key
+        """
+        if (key ^ to_key) >> self.widget_field_shift:
+            return None
+        _, costs, prev_poses, prev_actions = self.get_bee_walk_packed(key)
+        pose = (((to_key >> BEE_ORIENT_BITS) & ((1 << self.cell_index_bits) - 1)) * N_DIRECTIONS) + \
+            (to_key & ((1 << BEE_ORIENT_BITS) - 1))
+        if costs[pose] == UNREACHABLE:
+            return None
+        actions = []
+        while prev_poses[pose] >= 0:
+            actions.append(prev_actions[pose])
+            pose = prev_poses[pose]
+        actions.reverse()
+        return actions
+
+    def get_widget_masks_packed(self, key):
+        """
+        Return the bitboard of each widget in the given packed state. A search which both tests and expands a packed
+        state can compute these once and pass them to is_solved_packed and get_successors_packed.
+        :param key: packed state [int]
+        :return: ([bitboard for each widget], bitboard of all cells occupied by widgets)
+        """
+        field_mask = (1 << self.widget_field_bits) - 1
+        key >>= self.widget_field_shift
+        widget_masks = []
+        widgets_mask = 0
+        for w_type in self.widget_types:
+            mask = self.placement_masks[w_type][key & field_mask]
+            widget_masks.append(mask)
+            widgets_mask |= mask
+            key >>= self.widget_field_bits
+        return widget_masks, widgets_mask
+
+    def _perform_move_packed(self, key, action, widget_masks, widgets_mask, int_costs=False):
+        """
+        Perform a FORWARD or REVERSE action on the given packed state (see perform_action_packed).
+        :param key: packed state [int]
+        :param action: FORWARD or REVERSE
+        :param widget_masks: bitboard of each widget (see get_widget_masks_packed)
+        :param widgets_mask: bitboard of all cells occupied by widgets
+        :param int_costs: if True, return the cost as an integer in units of 1 / COST_SCALE
+        :return: (successful [True/False], cost [float], next_key [int])
+        """
+        BEE_orient = key & ((1 << BEE_ORIENT_BITS) - 1)
+        BEE_idx = (key >> BEE_ORIENT_BITS) & ((1 << self.cell_index_bits) - 1)
+        forward_idx = self.adjacent_cells[(BEE_idx * N_DIRECTIONS) + BEE_orient]
+        if action == FORWARD:
+            move_direction = BEE_orient
+            new_idx = forward_idx
+        else:
+            move_direction = OPPOSITE_DIRECTION_INDEX[BEE_orient]
+            new_idx = self.adjacent_cells[(BEE_idx * N_DIRECTIONS) + move_direction]
+
+        # test for BEE collision with boundary or obstacle, and for reversing collision with a widget
+        new_bit = self.cell_bits[new_idx]
+        if new_bit & self.blocked_mask or (action == REVERSE and new_bit & widgets_mask):
+            return False, None, None
+        next_key = key ^ ((BEE_idx ^ new_idx) << BEE_ORIENT_BITS)
+
+        forward_bit = self.cell_bits[forward_idx]
+        if not forward_bit & widgets_mask:
+            # this action does not push or pull any widgets
+            return True, ACTION_BASE_COST_INT[action] if int_costs else ACTION_BASE_COST[action], next_key
+
+        # this action pushes or pulls widget i
+        i = 0
+        while not widget_masks[i] & forward_bit:
+            i += 1
+        if int_costs:
+            cost = ACTION_BASE_COST_INT[action] + ACTION_PUSH_COST_INT[action]
+        else:
+            cost = ACTION_BASE_COST[action] + ACTION_PUSH_COST[action]
+        w_type = self.widget_types[i]
+        shift = self.widget_field_shift + (i * self.widget_field_bits)
+        field = (key >> shift) & ((1 << self.widget_field_bits) - 1)
+        centre_idx = field >> WIDGET_ORIENT_BITS
+        w_orient = field & ((1 << WIDGET_ORIENT_BITS) - 1)
+        blocked_mask = self.blocked_mask | (widgets_mask ^ widget_masks[i])
+
+        # get movement type - always use forward direction
+        if forward_idx == centre_idx:
+            widget_move_type = TRANSLATE
+        else:
+            k = self.placement_cells[w_type][field].index(forward_idx)
+            arm_direction = WIDGET_ARM_DIRECTION_INDEX[w_type][w_orient][k - 1]
+            widget_move_type = WIDGET_MOVE_TYPE_INDEX[(BEE_orient * N_DIRECTIONS) + arm_direction]
+
+        if widget_move_type == TRANSLATE:
+            # translate widget in movement direction
+            new_centre_idx = self.adjacent_cells[(centre_idx * N_DIRECTIONS) + move_direction]
+            if new_centre_idx == OUT_OF_BOUNDS:
+                return False, None, None
+            new_field = (new_centre_idx << WIDGET_ORIENT_BITS) | w_orient
+        else:
+            # rotating a widget while reversing is not possible
+            if action == REVERSE:
+                return False, None, None
+            if widget_move_type == SPIN_CW:
+                new_field = (centre_idx << WIDGET_ORIENT_BITS) | WIDGET_SPIN_CW_INDEX[w_type][w_orient]
+            else:
+                new_field = (centre_idx << WIDGET_ORIENT_BITS) | WIDGET_SPIN_CCW_INDEX[w_type][w_orient]
+            # rotated widget must not overlap the new BEE position
+            blocked_mask |= new_bit
+
+        # test collision with boundary, obstacles and other widgets
+        if self.placement_masks[w_type][new_field] & blocked_mask:
+            return False, None, None
+        return True, cost, next_key ^ ((field ^ new_field) << shift)
+
+    def get_widget_occupancy(self, state):
+        """
+        Return the widget occupancy index for the given state, computing it and caching it on the state if it has not
+        already been computed. States produced by perform_action inherit an (incrementally updated) index from their
+        parent, so this is only computed from scratch for states constructed directly.
+
+        :param state: current state
+        :return: (dict mapping cell index -> id of the widget occupying it, bitboard of all cells occupied by widgets,
+                  bitboard of target cells covered by a widget)
+        """
+        if state.widget_occupancy is None:
+            widget_index = {}
+            widgets_mask = 0
+            for i in range(self.n_widgets):
+                key = (self.widget_types[i], state.widget_centres[i], state.widget_orients[i])
+                for idx in self.widget_footprints[key]:
+                    widget_index[idx] = i
+                widgets_mask |= self.widget_footprint_masks[key]
+            state.widget_occupancy = (widget_index, widgets_mask, self.target_mask & widgets_mask)
+        return state.widget_occupancy
+
+    def widget_get_occupied_cell_indices(self, w_type, centre, orient):
+        """
+        Return a list of flat cell indices which are occupied by this widget, computed using the precomputed adjacency
+        table. The centre cell is always first, followed by one cell for each element of
+        WIDGET_ARM_DIRECTIONS[(w_type, orient)].
+
+        :param w_type: widget type
+        :param centre: (row, col) centre point of the widget (must be inside the hex grid)
+        :param orient: orientation of the widget
+        :return: (cell index for each cell), where cells outside the hex grid are OUT_OF_BOUNDS
+        """
+        cr, cc = centre
+        centre_idx = (cr * self.n_cols) + cc
+        occupied = [centre_idx]
+        for direction in WIDGET_ARM_DIRECTIONS[(w_type, orient)]:
+            occupied.append(self.adjacent_cells[(centre_idx * N_DIRECTIONS) + DIRECTION_INDEX[direction]])
+        return tuple(occupied)
+
+    def get_widget_cells(self, w_type, centre, orient):
+        """
+        Return the (row, col) coordinates of the cells occupied by this widget, using the precomputed footprint table.
+        Equivalent to widget_get_occupied_cells, but returns a shared immutable tuple instead of building a new list.
+
+        :param w_type: widget type
+        :param centre: centre point of the widget
+        :param orient: orientation of the widget
+        :return: ((r, c) for each cell)
+        """
+        cells = self.widget_footprint_cells.get((w_type, centre, orient))
+        if cells is None:
+            # centre is outside the hex grid - not in the footprint table
+            cells = tuple(widget_get_occupied_cells(w_type, centre, orient))
+        return cells
+
     def is_solved(self, state):
         """
         Check if the environment has been solved (i.e. all target cells are covered by a widget)
         :param state: current state
         :return: True if solved, False otherwise
         """
-        widget_cells = [widget_get_occupied_cells(self.widget_types[i], state.widget_centres[i],
-                                                  state.widget_orients[i]) for i in range(self.n_widgets)]
-        # loop over each target
-        env_solved = True
-        for tgt in self.target_list:
-            tgt_solved = False
-            # loop over all widgets to find a match
-            for i in range(self.n_widgets):
-                if tgt in widget_cells[i]:
-                    # match found
-                    tgt_solved = True
-                    break
-            # if no match found, then env is not solved
-            if not tgt_solved:
-                env_solved = False
-                break
-        return env_solved
+        occupancy = state.widget_occupancy
+        if occupancy is None:
+            occupancy = self.get_widget_occupancy(state)
+        # solved if every target is covered (covered targets are tracked incrementally by perform_action)
+        return occupancy[2] == self.target_mask
 
     def render(self, state):
         """
         Render the environment's current state to terminal
         :param state: current state
         """
+        enable_terminal_colours()
+
         class Colours:
             prefix = "\033["
             reset = f"{prefix}0m"
@@ -475,8 +1558,7 @@ class Environment:
             # assign an alphabetical letter to represent each widget
             w_letter_lc = string.ascii_lowercase[w]
             w_letter_uc = string.ascii_uppercase[w]
-            w_cells = widget_get_occupied_cells(self.widget_types[w], state.widget_centres[w], state.widget_orients[w])
-            w_cells = widget_get_occupied_cells(self.widget_types[w], state.widget_centres[w], state.widget_orients[w])
+            w_cells = self.get_widget_cells(self.widget_types[w], state.widget_centres[w], state.widget_orients[w])
             for wi, wj in w_cells:
                 # draw in top half of cell, horizontally centered
                 y = wi * RENDER_CELL_DEPTH + (RENDER_CELL_SIDE_WIDTH if wj % 2 == 1 else 0) + RENDER_CELL_SIDE_WIDTH
@@ -546,6 +1628,118 @@ class Environment:
         print('\n')
 
 
+def load_compiled_level(filename):
+    """
+    Return the compiled level (dict of Environment instance variables) for the given input file, or None if the input
+    file has not been compiled, or has been modified or the code which compiles levels (LEVEL_CACHE_CODE_FILES) has
+    been changed since it was compiled. Each call returns new copies of all tables, so an Environment may modify its
+    tables without affecting other instances.
+    :param filename: name of input file
+    :return: dict of instance variables, or None
+    """
+    path = os.path.abspath(filename)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    data = _compiled_levels.get(key)
+    try:
+        if data is None:
+            with open(_compiled_level_filename(path), 'rb') as f:
+                magic, version, mtime_ns, size, digest = LEVEL_CACHE_HEADER.unpack(f.read(LEVEL_CACHE_HEADER.size))
+                if (magic != LEVEL_CACHE_MAGIC or version != LEVEL_CACHE_VERSION or mtime_ns != stat.st_mtime_ns or
+                        size != stat.st_size or digest != get_level_cache_code_digest()):
+                    return None
+                data = f.read()
+        compiled = pickle.loads(data)
+    except (OSError, struct.error, pickle.UnpicklingError, EOFError):
+        return None
+    _compiled_levels[key] = data
+    return compiled
+
+
+def save_compiled_level(filename, environment):
+    """
+    Store the parsed level and precomputed tables of the given environment as the compiled level for the given input
+    file. Failure to write the cache file (e.g. read-only directory) is ignored.
+    :param filename: name of input file
+    :param environment: Environment instance created from the input file
+    """
+    path = os.path.abspath(filename)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return
+    compiled = {k: v for k, v in environment.__dict__.items() if k != 'force_valid'}
+    # store the pickled level, so that each instance loaded from it has its own copy of every table
+    data = pickle.dumps(compiled, pickle.HIGHEST_PROTOCOL)
+    _compiled_levels[(path, stat.st_mtime_ns, stat.st_size)] = data
+
+    def write(f):
+        f.write(LEVEL_CACHE_HEADER.pack(LEVEL_CACHE_MAGIC, LEVEL_CACHE_VERSION, stat.st_mtime_ns, stat.st_size,
+                                        get_level_cache_code_digest()))
+        f.write(data)
+
+    write_file_atomic(_compiled_level_filename(path), write)
+
+
+def write_file_atomic(filename, write_fn):
+    """
+    Write a binary file by passing a temporary file in the same directory to write_fn, then renaming the temporary file
+    to the given filename, so that concurrent readers (and later runs, if writing is interrupted) never see a partial
+    file. The directory is created if it does not exist. Used for every cache and checkpoint file.
+    :param filename: name of file to write
+    :param write_fn: function taking a file object open for binary writing
+    :return: True if the file was written, False if it could not be written (e.g. read-only directory)
+    """
+    tmp_filename = f'{filename}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        with open(tmp_filename, 'wb') as f:
+            write_fn(f)
+        os.replace(tmp_filename, filename)
+    except OSError:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def get_level_cache_code_digest():
+    """
+    Return a digest of the source files which build compiled levels (LEVEL_CACHE_CODE_FILES). Compiled levels are only
+    reused if they were built by code with the same digest, so a change to how tables are built never serves stale
+    tables from LEVEL_CACHE_DIR.
+    :return: SHA-1 digest [bytes]
+    """
+    global _level_cache_code_digest
+    if _level_cache_code_digest is None:
+        h = hashlib.sha1()
+        code_dir = os.path.dirname(os.path.abspath(__file__))
+        for name in LEVEL_CACHE_CODE_FILES:
+            with open(os.path.join(code_dir, name), 'rb') as f:
+                h.update(f.read())
+        _level_cache_code_digest = h.digest()
+    return _level_cache_code_digest
+
+
+def _compiled_level_filename(path):
+    return os.path.join(LEVEL_CACHE_DIR, hashlib.sha1(path.encode()).hexdigest() + '.lvl')
+
+
+def enable_terminal_colours():
+    """
+    Enable coloured terminal output (required on some Windows terminals). Only performed once per process.
+    """
+    global _terminal_colour_enabled
+    if not _terminal_colour_enabled:
+        os.system('color')
+        _terminal_colour_enabled = True
+
+
 def get_adjacent_cell_coords(posit, direction):
     """
     Return the coordinates of the cell adjacent to the given position in the given direction.
@@ -555,30 +1749,8 @@ def get_adjacent_cell_coords(posit, direction):
     :return: (row, col) of adjacent cell
     """
     r, c = posit
-    if direction == BEE_UP:
-        return r - 1, c
-    elif direction == BEE_DOWN:
-        return r + 1, c
-    elif direction == BEE_UP_LEFT:
-        if c % 2 == 0:
-            return r - 1, c - 1
-        else:
-            return r, c - 1
-    elif direction == BEE_UP_RIGHT:
-        if c % 2 == 0:
-            return r - 1, c + 1
-        else:
-            return r, c + 1
-    elif direction == BEE_DOWN_LEFT:
-        if c % 2 == 0:
-            return r, c - 1
-        else:
-            return r + 1, c - 1
-    else:   # direction == BEE_DOWN_RIGHT
-        if c % 2 == 0:
-            return r, c + 1
-        else:
-            return r + 1, c + 1
+    dr, dc = ADJACENT_OFFSETS[direction][c % 2]
+    return r + dr, c + dc
 
 
 def widget_get_occupied_cells(w_type, centre, orient):
@@ -592,64 +1764,8 @@ def widget_get_occupied_cells(w_type, centre, orient):
     :return: [(r, c) for each cell]
     """
     occupied = [centre]
-    cr, cc = centre
-
-    # cell in UP direction
-    if ((w_type == WIDGET3 and orient == VERTICAL) or
-            (w_type == WIDGET4 and orient == UP) or
-            (w_type == WIDGET5 and (orient == SLANT_LEFT or orient == SLANT_RIGHT))):
-        occupied.append((cr - 1, cc))
-
-    # cell in DOWN direction
-    if ((w_type == WIDGET3 and orient == VERTICAL) or
-            (w_type == WIDGET4 and orient == DOWN) or
-            (w_type == WIDGET5 and (orient == SLANT_LEFT or orient == SLANT_RIGHT))):
-        occupied.append((cr + 1, cc))
-
-    # cell in UP_LEFT direction
-    if ((w_type == WIDGET3 and orient == SLANT_LEFT) or
-            (w_type == WIDGET4 and orient == DOWN) or
-            (w_type == WIDGET5 and (orient == SLANT_LEFT or orient == HORIZONTAL))):
-        if cc % 2 == 0:
-            # even column - row decreases
-            occupied.append((cr - 1, cc - 1))
-        else:
-            # odd column - row stays the same
-            occupied.append((cr, cc - 1))
-
-    # cell in UP_RIGHT direction
-    if ((w_type == WIDGET3 and orient == SLANT_RIGHT) or
-            (w_type == WIDGET4 and orient == DOWN) or
-            (w_type == WIDGET5 and (orient == SLANT_RIGHT or orient == HORIZONTAL))):
-        if cc % 2 == 0:
-            # even column - row decreases
-            occupied.append((cr - 1, cc + 1))
-        else:
-            # odd column - row stays the same
-            occupied.append((cr, cc + 1))
-
-    # cell in DOWN_LEFT direction
-    if ((w_type == WIDGET3 and orient == SLANT_RIGHT) or
-            (w_type == WIDGET4 and orient == UP) or
-            (w_type == WIDGET5 and (orient == SLANT_RIGHT or orient == HORIZONTAL))):
-        if cc % 2 == 0:
-            # even column - row stays the same
-            occupied.append((cr, cc - 1))
-        else:
-            # odd column - row increases
-            occupied.append((cr + 1, cc - 1))
-
-    # cell in DOWN_RIGHT direction
-    if ((w_type == WIDGET3 and orient == SLANT_LEFT) or
-            (w_type == WIDGET4 and orient == UP) or
-            (w_type == WIDGET5 and (orient == SLANT_LEFT or orient == HORIZONTAL))):
-        if cc % 2 == 0:
-            # even column - row stays the same
-            occupied.append((cr, cc + 1))
-        else:
-            # odd column - row increases
-            occupied.append((cr + 1, cc + 1))
-
+    for direction in WIDGET_ARM_DIRECTIONS[(w_type, orient)]:
+        occupied.append(get_adjacent_cell_coords(centre, direction))
     return occupied
 
 
@@ -670,50 +1786,8 @@ def widget_get_movement_type(BEE_orient, forward_BEE_posit, centre):
     if forward_BEE_posit == centre:
         return TRANSLATE
 
-    # if direction between new_BEE_posit and centre is the same as BEE_orient, then move is a translation
+    # find the direction of new_BEE_posit relative to the centre, then look up the movement type for this direction
     nr, nc = forward_BEE_posit
     cr, cc = centre
-
-    # these directions do not depend on even/odd column
-    if nr == cr - 1 and nc == cc:
-        direction = BEE_DOWN
-    elif nr == cr + 1 and nc == cc:
-        direction = BEE_UP
-    elif nr == cr - 1 and nc == cc - 1:
-        direction = BEE_DOWN_RIGHT
-    elif nr == cr - 1 and nc == cc + 1:
-        direction = BEE_DOWN_LEFT
-    elif nr == cr + 1 and nc == cc - 1:
-        direction = BEE_UP_RIGHT
-    elif nr == cr + 1 and nc == cc + 1:
-        direction = BEE_UP_LEFT
-
-    # these directions split based on even/odd
-    elif nr == cr and nc == cc - 1:
-        direction = BEE_UP_RIGHT if cc % 2 == 0 else BEE_DOWN_RIGHT
-    else:  # nr == cr and nc == cc + 1
-        direction = BEE_UP_LEFT if cc % 2 == 0 else BEE_DOWN_LEFT
-
-    if direction == BEE_orient:
-        return TRANSLATE
-    elif (direction == {BEE_UP: BEE_DOWN_RIGHT,
-                        BEE_UP_LEFT: BEE_UP_RIGHT,
-                        BEE_DOWN_LEFT: BEE_UP,
-                        BEE_DOWN: BEE_UP_LEFT,
-                        BEE_DOWN_RIGHT: BEE_DOWN_LEFT,
-                        BEE_UP_RIGHT: BEE_DOWN}[BEE_orient]):
-        return SPIN_CW
-    else:
-        return SPIN_CCW
-
-
-
-
-
-
-
-
-
-
-
-
+    direction = OFFSET_DIRECTION[(cc % 2, nr - cr, nc - cc)]
+    return WIDGET_MOVE_TYPE[(BEE_orient, direction)]
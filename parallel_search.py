@@ -0,0 +1,266 @@
+import time
+import queue
+import multiprocessing
+from constants import *
+from search import BucketQueue
+
+"""
+parallel_search.py
+
+This file contains a parallel A* search engine (Hash Distributed A*, HDA*) which runs a single search across several
+worker processes.
+
+Every packed state (see Environment.encode) is owned by one worker, chosen by the Zobrist hash of the state (see
+Environment.get_zobrist_hash_packed). Each worker keeps the open and closed lists for the states it owns. When a
+worker expands a state, successors owned by other workers are sent to their owners in batches through multiprocessing
+queues.
+
+A solution found by any worker is only known to be optimal once no worker has an open state with f below the cost of
+the best solution found and no batches are in transit. This is detected by the main process using counters held in
+shared memory (see hda_star).
+
+COMP3702 2024 Assignment 1 Support Code
+"""
+
+# number of expansions performed by a worker between sending successor batches to other workers
+HDA_BATCH_EXPANSIONS = 64
+# time (seconds) an idle worker waits for a message, and between termination checks by the main process
+HDA_POLL_INTERVAL = 0.005
+# time (seconds) to wait for workers to exit before terminating them
+HDA_JOIN_TIMEOUT = 5
+
+# message types sent to workers
+MSG_NODES = 0       # (MSG_NODES, [(packed state, path cost, parent packed state, action), ...])
+MSG_REPORT = 1      # (MSG_REPORT,) - reply with the best goal found by this worker
+MSG_TRACE = 2       # (MSG_TRACE, packed state) - reply with the parent state and action of the given state
+MSG_QUIT = 3        # (MSG_QUIT,)
+NO_SOLUTION = -1
+
+
+def hda_star(environment, n_workers=None, heuristic_factory=None, loop_counter=None, init_state=None):
+    """
+    Find a lowest cost path which solves the environment using Hash Distributed A* over n_workers processes.
+
+    Termination: the main process repeatedly reads each worker's sent and received batch counters and idle flag (a
+    worker is idle when it has no open state with f below the best solution cost). A worker marks itself busy before
+    it counts a received batch, and counts sent batches before sending them. So if the counters are balanced and
+    unchanged across a read of all idle flags, no batches were in transit and every worker was idle at that time.
+
+    :param environment: an Environment instance
+    :param n_workers: number of worker processes (defaults to the number of CPUs)
+    :param heuristic_factory: picklable function which is called in each worker with the environment, and returns a
+        function mapping a packed state to an admissible estimate of the cost to the goal [float] (defaults to 0,
+        i.e. parallel UCS)
+    :param loop_counter: LoopCounter instance from tester (or None). The main process calls loop_counter.inc() for
+        each expansion performed by the workers since its last termination check, so the loop counter's count and
+        timing samples follow the progress of the search.
+    :param init_state: State to search from (defaults to the environment's initial state)
+    :return: path (list of actions, where each action is an element of BEE_ACTIONS), or None if no solution exists
+    :raises RuntimeError: if a worker process exits unexpectedly (e.g. the heuristic raises an exception)
+    """
+    if n_workers is None:
+        n_workers = multiprocessing.cpu_count()
+    if init_state is None:
+        init_state = environment.get_init_state()
+    root_key = environment.get_canonical_key(init_state)
+
+    # the main process sends the initial batch, so uses counter n_workers
+    sent = multiprocessing.Array('q', n_workers + 1, lock=False)
+    received = multiprocessing.Array('q', n_workers, lock=False)
+    idle = multiprocessing.Array('b', n_workers, lock=False)
+    expansions = multiprocessing.Array('q', n_workers, lock=False)
+    incumbent = multiprocessing.Value('q', NO_SOLUTION)
+    inboxes = [multiprocessing.Queue() for _ in range(n_workers)]
+    replies = multiprocessing.Queue()
+
+    workers = [multiprocessing.Process(target=_hda_star_worker,
+                                       args=(environment, i, heuristic_factory, inboxes, replies, sent, received, idle,
+                                             expansions, incumbent), daemon=True)
+               for i in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        sent[n_workers] = 1
+        inboxes[environment.get_zobrist_hash_packed(root_key) % n_workers].put((MSG_NODES, [(root_key, 0, None, None)]))
+
+        # wait for termination (see docstring)
+        n_counted = 0
+        while True:
+            time.sleep(HDA_POLL_INTERVAL)
+            _check_workers(workers)
+            n_counted = _count_expansions(loop_counter, expansions, n_counted)
+            total_sent = sum(sent)
+            total_received = sum(received)
+            if total_sent != total_received or not all(idle):
+                continue
+            if sum(sent) == total_sent and sum(received) == total_received:
+                break
+        # count expansions made between the last count and the termination check
+        _count_expansions(loop_counter, expansions, n_counted)
+
+        # find the worker holding the best goal, then trace the path back through the owner of each state
+        for inbox in inboxes:
+            inbox.put((MSG_REPORT,))
+        goals = [_get_reply(replies, workers) for _ in range(n_workers)]
+        goals = [goal for goal in goals if goal is not None]
+        if not goals:
+            return None
+        key = min(goals, key=lambda goal: goal[0])[1]
+        path = []
+        while key != root_key:
+            inboxes[environment.get_zobrist_hash_packed(key) % n_workers].put((MSG_TRACE, key))
+            key, action = _get_reply(replies, workers)
+            path.append(action)
+        path.reverse()
+        return path
+    except BaseException:
+        # a worker has failed or the search was interrupted - stop the remaining workers immediately
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        raise
+    finally:
+        for inbox in inboxes:
+            inbox.put((MSG_QUIT,))
+        for worker in workers:
+            worker.join(HDA_JOIN_TIMEOUT)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+
+
+def _count_expansions(loop_counter, expansions, n_counted):
+    """
+    Call loop_counter.inc() once for each expansion performed by the workers which has not yet been counted.
+    :param loop_counter: LoopCounter instance from tester (or None)
+    :param expansions: shared array of the number of expansions performed by each worker
+    :param n_counted: number of expansions already counted
+    :return: number of expansions counted after this call
+    """
+    total = sum(expansions)
+    if loop_counter is not None:
+        for _ in range(total - n_counted):
+            loop_counter.inc()
+    return total
+
+
+def _check_workers(workers):
+    """
+    Raise RuntimeError if any worker process has exited (workers only exit when sent MSG_QUIT).
+    :param workers: list of worker processes
+    """
+    for i, worker in enumerate(workers):
+        if worker.exitcode is not None:
+            raise RuntimeError(f'HDA* worker {i} exited unexpectedly with exit code {worker.exitcode}')
+
+
+def _get_reply(replies, workers):
+    """
+    Wait for a reply from a worker, checking that no worker has exited while waiting.
+    :param replies: queue of replies from workers
+    :param workers: list of worker processes
+    :return: reply
+    """
+    while True:
+        try:
+            return replies.get(timeout=HDA_POLL_INTERVAL)
+        except queue.Empty:
+            _check_workers(workers)
+
+
+def _hda_star_worker(environment, worker_id, heuristic_factory, inboxes, replies, sent, received, idle, expansions,
+                     incumbent):
+    """
+    Main loop of a HDA* worker process (see hda_star for arguments).
+    """
+    n_workers = len(inboxes)
+    inbox = inboxes[worker_id]
+    heuristic = heuristic_factory(environment) if heuristic_factory is not None else None
+
+    # packed state -> best known path cost, integer heuristic value, (parent packed state, action)
+    path_costs = {}
+    h_values = {}
+    parents = {}
+    # packed state -> path cost when last expanded
+    expanded = {}
+    frontier = BucketQueue()
+    best_goal = None
+    outboxes = [[] for _ in range(n_workers)]
+
+    def add_node(key, path_cost, parent, action):
+        if key in path_costs and path_costs[key] <= path_cost:
+            return
+        h = h_values.get(key)
+        if h is None:
+            # round down, since any path cost is a whole number of 1 / COST_SCALE units
+            h = h_values[key] = int((heuristic(key) * COST_SCALE) + 1e-6) if heuristic is not None else 0
+        bound = incumbent.value
+        if bound != NO_SOLUTION and path_cost + h >= bound:
+            return
+        path_costs[key] = path_cost
+        parents[key] = (parent, action)
+        frontier.push(path_cost + h, key)
+
+    while True:
+        # process waiting messages (block briefly if there is no local work)
+        block = len(frontier) == 0
+        while True:
+            try:
+                message = inbox.get(timeout=HDA_POLL_INTERVAL) if block else inbox.get_nowait()
+            except queue.Empty:
+                break
+            block = False
+            if message[0] == MSG_NODES:
+                idle[worker_id] = 0
+                for key, path_cost, parent, action in message[1]:
+                    add_node(key, path_cost, parent, action)
+                received[worker_id] += 1
+            elif message[0] == MSG_REPORT:
+                replies.put(best_goal)
+            elif message[0] == MSG_TRACE:
+                replies.put(parents[message[1]])
+            elif message[0] == MSG_QUIT:
+                return
+
+        # expand a batch of states
+        n_expanded = 0
+        while frontier and n_expanded < HDA_BATCH_EXPANSIONS:
+            f, key = frontier.pop()
+            path_cost = path_costs[key]
+            if f != path_cost + h_values[key] or expanded.get(key) == path_cost:
+                # stale entry
+                continue
+            bound = incumbent.value
+            if bound != NO_SOLUTION and f >= bound:
+                # all remaining states are stale or cannot lead to a cheaper solution
+                frontier = BucketQueue()
+                break
+            expanded[key] = path_cost
+            n_expanded += 1
+
+            widget_masks = environment.get_widget_masks_packed(key)
+            if environment.is_solved_packed(key, widget_masks[1]):
+                with incumbent.get_lock():
+                    if incumbent.value == NO_SOLUTION or path_cost < incumbent.value:
+                        incumbent.value = path_cost
+                        best_goal = (path_cost, key)
+                continue
+            successors = environment.get_successors_packed(key, int_costs=True, widget_masks=widget_masks)
+            for action, cost, next_key in successors:
+                # states which differ only by swapping widgets of the same type are treated as duplicates
+                next_key = environment.get_canonical_key_packed(next_key)
+                owner = environment.get_zobrist_hash_packed(next_key) % n_workers
+                if owner == worker_id:
+                    add_node(next_key, path_cost + cost, key, action)
+                else:
+                    outboxes[owner].append((next_key, path_cost + cost, key, action))
+        expansions[worker_id] += n_expanded
+
+        # send successor batches to their owners
+        for owner, batch in enumerate(outboxes):
+            if batch:
+                sent[worker_id] += 1
+                inboxes[owner].put((MSG_NODES, batch))
+                outboxes[owner] = []
+        if not frontier:
+            idle[worker_id] = 1
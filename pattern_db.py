@@ -0,0 +1,249 @@
+import os
+import mmap
+import struct
+import hashlib
+import itertools
+from constants import *
+from environment import write_file_atomic, get_level_cache_code_digest
+
+"""
+pattern_db.py
+
+This file contains a class representing a disk-backed pattern database (PDB), which can be used to build admissible
+heuristics for A* search.
+
+A pattern database over a subset of the widgets stores, for every placement of the widgets in the subset, the minimum
+number of widget moves (pushes, pulls and rotations) needed to reach a placement where the subset covers enough targets
+for the remaining widgets to be able to cover the rest. The BEE and all widgets outside the subset are ignored, so the
+stored values are lower bounds. Every action moves at most one widget, so values from pattern databases over disjoint
+widget subsets can be added together and remain admissible.
+
+Building a pattern database can take much longer than a single search, so each database is written to a binary file
+keyed by a fingerprint of the level and the code which builds it (see level_fingerprint) and re-opened with mmap on
+later runs. A cache file which is corrupt or truncated is rebuilt.
+
+COMP3702 2024 Assignment 1 Support Code
+"""
+
+PDB_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdb_cache')
+PDB_MAGIC = b'BPDB'
+PDB_VERSION = 3
+# header: magic, version, number of widgets in subset, number of placements per widget, fingerprint (SHA-1 digest)
+PDB_HEADER = struct.Struct('<4sHHI20s')
+PDB_UNREACHABLE = 0xFF
+# largest stored distance - placements PDB_MAX_DISTANCE or more widget moves from a goal are stored as PDB_MAX_DISTANCE
+PDB_MAX_DISTANCE = PDB_UNREACHABLE - 1
+
+
+def level_fingerprint(environment, widget_ids):
+    """
+    Return a fingerprint identifying a pattern database for the given level and subset of widgets. Two levels with the
+    same grid size, obstacles, targets, subset widget types and total number of cells covered by the widgets outside the
+    subset (which determines the goal placements, see PatternDatabase.build) share pattern databases, regardless of the
+    initial BEE and widget positions. The digest of the code which builds levels (see get_level_cache_code_digest) is
+    included, so a change to the move rules never serves stale pattern databases.
+    :param environment: an Environment instance
+    :param widget_ids: indices of the widgets in the subset
+    :return: SHA-1 digest [bytes]
+    """
+    h = hashlib.sha1()
+    h.update(f'{PDB_VERSION};{environment.n_rows},{environment.n_cols};'.encode())
+    h.update(f'{environment.obstacle_mask};{environment.target_mask};'.encode())
+    h.update(''.join(environment.widget_types[i] for i in widget_ids).encode())
+    h.update(f';{others_capacity(environment, widget_ids)};'.encode())
+    h.update(get_level_cache_code_digest())
+    return h.digest()
+
+
+def others_capacity(environment, widget_ids):
+    """
+    Return the number of cells covered by the widgets outside the given subset.
+    :param environment: an Environment instance
+    :param widget_ids: indices of the widgets in the subset
+    :return: number of cells
+    """
+    # widget type is the number of cells the widget covers
+    return sum(int(environment.widget_types[i]) for i in range(environment.n_widgets) if i not in widget_ids)
+
+
+class PatternDatabase:
+    """
+    Instance of a pattern database over a subset of the widgets of an environment.
+
+    Entries are indexed by the packed placements (see Environment.encode) of the widgets in the subset, with the first
+    widget in the subset as the least significant digit (base n_placements). Each entry is a single byte holding the
+    minimum number of widget moves (where PDB_MAX_DISTANCE means PDB_MAX_DISTANCE or more), or PDB_UNREACHABLE if no
+    goal placement can be reached.
+    """
+
+    def __init__(self, environment, widget_ids, cache_dir=PDB_CACHE_DIR):
+        """
+        Open the pattern database for the given environment and widget subset, building it and writing it to the cache
+        directory first if it does not already exist.
+
+        :param environment: an Environment instance
+        :param widget_ids: indices of the widgets in the subset
+        :param cache_dir: directory where pattern database files are stored
+        """
+        self.environment = environment
+        self.widget_ids = tuple(widget_ids)
+        self.fingerprint = level_fingerprint(environment, self.widget_ids)
+        self.filename = os.path.join(cache_dir, self.fingerprint.hex() + '.pdb')
+        self.radix = environment.n_placements
+        self.size = self.radix ** len(self.widget_ids)
+
+        self._file = None
+        if self._open_file():
+            return
+        table = self.build()
+        header = PDB_HEADER.pack(PDB_MAGIC, PDB_VERSION, len(self.widget_ids), self.radix, self.fingerprint)
+
+        def write(f):
+            f.write(header)
+            f.write(table)
+
+        if not write_file_atomic(self.filename, write) or not self._open_file():
+            # cache directory is not writable - keep the table in memory
+            self.table = header + table
+            self.offset = PDB_HEADER.size
+
+    def _open_file(self):
+        """
+        Memory-map the cache file for this pattern database, if it exists and holds a complete database for this level
+        and widget subset.
+        :return: True if the file was opened, False if it is missing, corrupt or does not match (a cache miss)
+        """
+        try:
+            f = open(self.filename, 'rb')
+        except OSError:
+            return False
+        try:
+            table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # e.g. empty file
+            f.close()
+            return False
+        try:
+            magic, version, n_widgets, radix, fingerprint = PDB_HEADER.unpack_from(table, 0)
+        except struct.error:
+            magic = None
+        if magic != PDB_MAGIC or version != PDB_VERSION or fingerprint != self.fingerprint or \
+                n_widgets != len(self.widget_ids) or radix != self.radix or \
+                len(table) != PDB_HEADER.size + self.size:
+            table.close()
+            f.close()
+            return False
+        self._file = f
+        self.table = table
+        self.offset = PDB_HEADER.size
+        return True
+
+    def build(self):
+        """
+        Compute the pattern database table with a backwards breadth first search from all goal placements of the
+        widget subset. A placement is a goal if the number of targets not covered by the subset is no more than the
+        number of cells the remaining widgets can cover. The search runs until every placement which can reach a goal
+        is found, so PDB_UNREACHABLE is only stored for placements which cannot.
+
+        :return: bytearray of distances, indexed as described in the class docstring
+        """
+        env = self.environment
+        w_types = [env.widget_types[i] for i in self.widget_ids]
+        capacity = others_capacity(env, self.widget_ids)
+        graphs = {w_type: env.get_single_widget_graph(w_type) for w_type in set(w_types)}
+        place_values = [self.radix ** j for j in range(len(w_types))]
+
+        # find all non-overlapping goal placements
+        table = bytearray([PDB_UNREACHABLE]) * self.size
+        frontier = []
+        for placements in itertools.product(*(graphs[w_type][0] for w_type in w_types)):
+            covered = 0
+            overlap = False
+            for w_type, p in zip(w_types, placements):
+                mask = env.placement_masks[w_type][p]
+                if covered & mask:
+                    overlap = True
+                    break
+                covered |= mask
+            if overlap:
+                continue
+            if bin(env.target_mask & ~covered).count('1') <= capacity:
+                idx = sum(p * v for p, v in zip(placements, place_values))
+                table[idx] = 0
+                frontier.append(idx)
+
+        # breadth first search over reverse widget moves, treating other subset widgets as obstacles
+        dist = 0
+        while frontier:
+            dist += 1
+            stored = min(dist, PDB_MAX_DISTANCE)
+            next_frontier = []
+            for idx in frontier:
+                placements = [(idx // v) % self.radix for v in place_values]
+                masks = [env.placement_masks[w_type][p] for w_type, p in zip(w_types, placements)]
+                for j, w_type in enumerate(w_types):
+                    others_mask = 0
+                    for k, mask in enumerate(masks):
+                        if k != j:
+                            others_mask |= mask
+                    for prev_p in graphs[w_type][1][placements[j]]:
+                        if env.placement_masks[w_type][prev_p] & others_mask:
+                            continue
+                        prev_idx = idx + ((prev_p - placements[j]) * place_values[j])
+                        if table[prev_idx] == PDB_UNREACHABLE:
+                            table[prev_idx] = stored
+                            next_frontier.append(prev_idx)
+            frontier = next_frontier
+        return table
+
+    def lookup(self, placements):
+        """
+        Return the stored number of widget moves for the given placements of the widget subset.
+        :param placements: packed placement of each widget in the subset, in subset order
+        :return: number of widget moves (at least, if PDB_MAX_DISTANCE), or PDB_UNREACHABLE
+        """
+        idx = 0
+        for p in reversed(placements):
+            idx = (idx * self.radix) + p
+        return self.table[self.offset + idx]
+
+    def lookup_packed(self, key):
+        """
+        Return the stored number of widget moves for the given packed state (see Environment.encode).
+        :param key: packed state [int]
+        :return: number of widget moves (at least, if PDB_MAX_DISTANCE), or PDB_UNREACHABLE
+        """
+        env = self.environment
+        field_mask = (1 << env.widget_field_bits) - 1
+        key >>= env.widget_field_shift
+        idx = 0
+        for i in reversed(self.widget_ids):
+            idx = (idx * self.radix) + ((key >> (i * env.widget_field_bits)) & field_mask)
+        return self.table[self.offset + idx]
+
+    def lookup_state(self, state):
+        """
+        Return the stored number of widget moves for the given state.
+        :param state: current state
+        :return: number of widget moves (at least, if PDB_MAX_DISTANCE), or PDB_UNREACHABLE
+        """
+        return self.lookup_packed(self.environment.encode(state))
+
+    def close(self):
+        if self._file is not None:
+            self.table.close()
+            self._file.close()
+
+
+def build_pattern_databases(environment, group_size=2, cache_dir=PDB_CACHE_DIR):
+    """
+    Partition the widgets of the given environment into groups of at most group_size widgets, and open (building if
+    necessary) a pattern database for each group. The values of the returned databases can be added together.
+    :param environment: an Environment instance
+    :param group_size: maximum number of widgets per pattern database (database size is n_placements ** group_size)
+    :param cache_dir: directory where pattern database files are stored
+    :return: list of PatternDatabase instances
+    """
+    widget_ids = list(range(environment.n_widgets))
+    return [PatternDatabase(environment, widget_ids[i:i + group_size], cache_dir)
+            for i in range(0, len(widget_ids), group_size)]
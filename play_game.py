@@ -131,8 +131,8 @@ class GUI:
         for w in range(self.game_env.n_widgets):
             w_letter_lc = string.ascii_lowercase[w]
             w_letter_uc = string.ascii_uppercase[w]
-            w_cells = widget_get_occupied_cells(self.game_env.widget_types[w], self.state.widget_centres[w],
-                                                self.state.widget_orients[w])
+            w_cells = self.game_env.get_widget_cells(self.game_env.widget_types[w], self.state.widget_centres[w],
+                                                     self.state.widget_orients[w])
             for wi, wj in w_cells:
                 x = self.hexagon_positions[(wi, wj)][0]
                 y = self.hexagon_positions[(wi, wj)][1]
@@ -0,0 +1,652 @@
+import os
+import time
+import struct
+import hashlib
+from array import array
+from constants import *
+from environment import write_file_atomic
+from state_table import DictStateTable, EMPTY_SLOT, NO_PARENT
+
+"""
+search.py
+
+This file contains reference search engines which operate on packed states (see Environment.encode), for use in your
+solver (e.g. Solver.solve_ucs).
+
+All engines use integer path costs (in units of 1 / COST_SCALE), so costs are compared exactly and frontiers can be
+stored in a bucket queue instead of a binary heap. Each state discovered by the search is assigned a node id, and the
+parent node id and action leading to each node are stored in compact arrays, so the solution path is only built once a
+goal is found.
+
+COMP3702 2024 Assignment 1 Support Code
+"""
+
+CHECKPOINT_MAGIC = b'BCKP'
+CHECKPOINT_VERSION = 2
+# header: magic, version, fingerprint of level and initial state (SHA-1 digest), number of states in table, number of
+# frontier buckets, number of frontier entries, number of expansions, bytes per packed state
+CHECKPOINT_HEADER = struct.Struct('<4sH20sqqqqH')
+# number of states read from each column of a checkpoint at a time
+CHECKPOINT_CHUNK_SIZE = 1 << 16
+# default time (seconds) between checkpoints, and number of expansions between checks of the time
+DEFAULT_CHECKPOINT_INTERVAL = 60
+CHECKPOINT_CHECK_EXPANSIONS = 1024
+# default IDA* transposition table capacity (number of states) and minimum bound increase (1.0 in cost units)
+DEFAULT_TABLE_SIZE = 1 << 20
+DEFAULT_BOUND_STEP = COST_SCALE
+
+
+class BucketQueue:
+    """
+    Priority queue for small non-negative integer priorities (e.g. path costs in units of 1 / COST_SCALE), with one
+    bucket per priority value.
+
+    Push is O(1). Pop is O(1) amortised when priorities are popped in nondecreasing order (as in UCS, or A* with a
+    consistent heuristic), as the search for the lowest non-empty bucket only moves forward. Pushing a priority lower
+    than the last popped priority is still handled correctly (e.g. A* with an inconsistent heuristic).
+
+    Items with equal priority are popped in last in first out order.
+    """
+
+    def __init__(self):
+        self.buckets = []
+        self.current = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, priority, item):
+        """
+        Add an item to the queue.
+        :param priority: non-negative integer priority
+        :param item: item to add
+        """
+        buckets = self.buckets
+        if priority >= len(buckets):
+            buckets.extend([] for _ in range(priority + 1 - len(buckets)))
+        buckets[priority].append(item)
+        if priority < self.current:
+            self.current = priority
+        self.size += 1
+
+    def pop(self):
+        """
+        Remove and return an item with the lowest priority.
+        :return: (priority, item)
+        """
+        if self.size == 0:
+            raise IndexError('pop from empty BucketQueue')
+        buckets = self.buckets
+        current = self.current
+        while not buckets[current]:
+            current += 1
+        self.current = current
+        self.size -= 1
+        return current, buckets[current].pop()
+
+    def min_priority(self):
+        """
+        Return the lowest priority of any item in the queue, without removing it.
+        :return: lowest priority
+        """
+        if self.size == 0:
+            raise IndexError('min_priority of empty BucketQueue')
+        buckets = self.buckets
+        while not buckets[self.current]:
+            self.current += 1
+        return self.current
+
+
+def reconstruct_path(parents, actions, node_id):
+    """
+    Return the list of actions leading from the root node (node id 0) to the given node.
+    :param parents: array of parent node id for each node id
+    :param actions: array of action leading to each node id
+    :param node_id: node id of final node in path
+    :return: path (list of actions, where each action is an element of BEE_ACTIONS)
+    """
+    path = []
+    while parents[node_id] != NO_PARENT:
+        path.append(actions[node_id])
+        node_id = parents[node_id]
+    path.reverse()
+    return path
+
+
+def reconstruct_path_from_links(links, key):
+    """
+    Return the list of actions leading from the root to the given packed state, where links maps each packed state to
+    (parent packed state, action), and None for the root.
+    :param links: dict of packed state -> (parent packed state, action) or None
+    :param key: packed state at end of path
+    :return: path (list of actions, where each action is an element of BEE_ACTIONS)
+    """
+    path = []
+    while links[key] is not None:
+        key, action = links[key]
+        path.append(action)
+    path.reverse()
+    return path
+
+
+def ucs(environment, loop_counter=None, init_state=None, table=None, checkpoint_file=None,
+        checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, stats=None):
+    """
+    Find a lowest cost path which solves the environment using Uniform Cost Search.
+
+    The frontier is a BucketQueue with lazy deletion (when a cheaper path to a frontier state is found, a new entry is
+    pushed and the old entry is skipped when popped). Each state is expanded at most once, and loop_counter.inc() is
+    called once per expansion. Discovered states are stored in a DictStateTable by default, as it is the fastest table.
+    A PackedStateTable uses around a third of the memory, at the cost of slower lookups.
+
+    If checkpoint_file is given, the table, frontier and number of expansions are saved to it every checkpoint_interval
+    seconds (see save_checkpoint). If the file already holds a checkpoint for the same level and initial state, the
+    search resumes from it. The loop counter only counts expansions performed by this call, and the number of
+    expansions restored from the checkpoint is reported separately through stats. The file is removed once the search
+    is complete.
+
+    :param environment: an Environment instance
+    :param loop_counter: LoopCounter instance from tester (or None)
+    :param init_state: State to search from (defaults to the environment's initial state)
+    :param table: empty table to store discovered states in (defaults to a new DictStateTable) - e.g. a
+        PackedStateTable, or a MappedStateTable for searches which may not fit in memory
+    :param checkpoint_file: name of checkpoint file (or None to disable checkpoints)
+    :param checkpoint_interval: time (seconds) between checkpoints
+    :param stats: dict (or None) which is updated with 'n_restored', the number of expansions restored from the
+        checkpoint, and 'n_expanded', the total number of expansions including those before the checkpoint
+    :return: path (list of actions, where each action is an element of BEE_ACTIONS), or None if no solution exists
+    """
+    if init_state is None:
+        init_state = environment.get_init_state()
+    root_key = environment.get_canonical_key(init_state)
+
+    # node id -> packed state, parent node id, action from parent, best known path cost, expanded flag
+    if table is None:
+        table = DictStateTable()
+    keys, parents, actions, path_costs, expanded = (table.keys, table.parents, table.actions, table.path_costs,
+                                                    table.expanded)
+    find, add, update = table.find, table.add, table.update
+    # states which differ only by swapping widgets of the same type are treated as duplicates
+    canonical_key = environment.get_canonical_key_packed
+
+    frontier = BucketQueue()
+    n_expanded = None
+    if checkpoint_file is not None:
+        n_expanded = load_checkpoint(checkpoint_file, environment, root_key, table, frontier)
+    if n_expanded is None:
+        n_expanded = 0
+        table.add(root_key, 0)
+        frontier.push(0, 0)
+    if stats is not None:
+        stats['n_restored'] = stats['n_expanded'] = n_expanded
+    next_checkpoint = time.time() + checkpoint_interval
+
+    while frontier:
+        if (checkpoint_file is not None and n_expanded % CHECKPOINT_CHECK_EXPANSIONS == 0 and
+                time.time() >= next_checkpoint):
+            save_checkpoint(checkpoint_file, environment, root_key, table, frontier, n_expanded)
+            next_checkpoint = time.time() + checkpoint_interval
+        path_cost, node_id = frontier.pop()
+        if expanded[node_id]:
+            # stale entry, a cheaper path to this state was found after this entry was pushed
+            continue
+        expanded[node_id] = 1
+        n_expanded += 1
+        if loop_counter is not None:
+            loop_counter.inc()
+
+        key = keys[node_id]
+        # the widget masks are computed once for both the goal test and successor generation
+        widget_masks = environment.get_widget_masks_packed(key)
+        if environment.is_solved_packed(key, widget_masks[1]):
+            remove_checkpoint(checkpoint_file)
+            if stats is not None:
+                stats['n_expanded'] = n_expanded
+            return reconstruct_path(parents, actions, node_id)
+
+        for action, cost, next_key in environment.get_successors_packed(key, int_costs=True, widget_masks=widget_masks):
+            next_key = canonical_key(next_key)
+            next_cost = path_cost + cost
+            next_id = find(next_key)
+            if next_id == EMPTY_SLOT:
+                next_id = add(next_key, next_cost, node_id, action)
+            elif expanded[next_id] or next_cost >= path_costs[next_id]:
+                continue
+            else:
+                update(next_id, next_cost, node_id, action)
+            frontier.push(next_cost, next_id)
+    remove_checkpoint(checkpoint_file)
+    if stats is not None:
+        stats['n_expanded'] = n_expanded
+    return None
+
+
+def checkpoint_fingerprint(environment, root_key):
+    """
+    Return a fingerprint identifying the search problem (level and initial state) a checkpoint belongs to.
+    :param environment: an Environment instance
+    :param root_key: canonical packed initial state
+    :return: SHA-1 digest [bytes]
+    """
+    h = hashlib.sha1()
+    h.update(f'{environment.n_rows},{environment.n_cols};'.encode())
+    h.update(f'{environment.obstacle_mask};{environment.target_mask};'.encode())
+    h.update(f'{"".join(environment.widget_types)};{root_key}'.encode())
+    return h.digest()
+
+
+def save_checkpoint(filename, environment, root_key, table, frontier, n_expanded):
+    """
+    Save the state of a search to a checkpoint file. The file contains a header (CHECKPOINT_HEADER), followed by each
+    column of the table (packed states, path costs, parents, actions and expanded flags - the hash table is rebuilt when
+    the checkpoint is loaded), the number of entries in each frontier bucket, and the node id of every frontier entry.
+
+    Each column is written directly from its array, so saving a MappedStateTable does not copy the table into memory.
+    The checkpoint is written with write_file_atomic, so an interrupted save never replaces the previous checkpoint with
+    a partial file. Failure to write the file is ignored.
+
+    :param filename: name of checkpoint file
+    :param environment: an Environment instance
+    :param root_key: canonical packed initial state
+    :param table: DictStateTable, PackedStateTable or MappedStateTable of the search
+    :param frontier: BucketQueue of (path cost, node id) entries
+    :param n_expanded: number of expansions performed so far
+    """
+    key_bytes = checkpoint_key_bytes(environment)
+    bucket_sizes = array('Q', [len(bucket) for bucket in frontier.buckets])
+
+    def write(f):
+        f.write(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION,
+                                       checkpoint_fingerprint(environment, root_key), len(table),
+                                       len(bucket_sizes), len(frontier), n_expanded, key_bytes))
+        if key_bytes == 8:
+            _write_column(f, table.keys, 'Q')
+        else:
+            for start in range(0, len(table), CHECKPOINT_CHUNK_SIZE):
+                f.write(b''.join(key.to_bytes(key_bytes, 'little')
+                                 for key in table.keys[start:start + CHECKPOINT_CHUNK_SIZE]))
+        _write_column(f, table.path_costs, 'Q')
+        _write_column(f, table.parents, 'q')
+        _write_column(f, table.actions, 'B')
+        _write_column(f, table.expanded, 'B')
+        bucket_sizes.tofile(f)
+        for bucket in frontier.buckets:
+            array('q', bucket).tofile(f)
+
+    write_file_atomic(filename, write)
+
+
+def load_checkpoint(filename, environment, root_key, table, frontier):
+    """
+    Load a checkpoint saved by save_checkpoint into an empty table and frontier. The table columns are read in chunks
+    of CHECKPOINT_CHUNK_SIZE states, so loading into a MappedStateTable does not need memory for the whole table.
+    :param filename: name of checkpoint file
+    :param environment: an Environment instance
+    :param root_key: canonical packed initial state
+    :param table: empty DictStateTable, PackedStateTable or MappedStateTable
+    :param frontier: empty BucketQueue
+    :return: number of expansions performed before the checkpoint, or None if the file does not exist or does not
+        hold a checkpoint for this level and initial state
+    """
+    try:
+        with open(filename, 'rb') as f:
+            magic, version, fingerprint, n_nodes, n_buckets, n_frontier, n_expanded, key_bytes = \
+                CHECKPOINT_HEADER.unpack(f.read(CHECKPOINT_HEADER.size))
+            if (magic != CHECKPOINT_MAGIC or version != CHECKPOINT_VERSION or
+                    fingerprint != checkpoint_fingerprint(environment, root_key) or
+                    key_bytes != checkpoint_key_bytes(environment)):
+                return None
+            # offset of each column (packed states, path costs, parents, actions, expanded flags)
+            offsets = [CHECKPOINT_HEADER.size]
+            for size in (key_bytes, 8, 8, 1, 1):
+                offsets.append(offsets[-1] + (size * n_nodes))
+            for start in range(0, n_nodes, CHECKPOINT_CHUNK_SIZE):
+                count = min(CHECKPOINT_CHUNK_SIZE, n_nodes - start)
+                f.seek(offsets[0] + (start * key_bytes))
+                if key_bytes == 8:
+                    keys = _read_column(f, 'Q', count)
+                else:
+                    data = f.read(count * key_bytes)
+                    keys = [int.from_bytes(data[i:i + key_bytes], 'little') for i in range(0, len(data), key_bytes)]
+                f.seek(offsets[1] + (start * 8))
+                path_costs = _read_column(f, 'Q', count)
+                f.seek(offsets[2] + (start * 8))
+                parents = _read_column(f, 'q', count)
+                f.seek(offsets[3] + start)
+                actions = f.read(count)
+                f.seek(offsets[4] + start)
+                expanded = f.read(count)
+                for i in range(count):
+                    node_id = table.add(keys[i], path_costs[i], parents[i], actions[i])
+                    if expanded[i]:
+                        table.expanded[node_id] = 1
+            f.seek(offsets[5])
+            bucket_sizes = _read_column(f, 'Q', n_buckets)
+            frontier_ids = _read_column(f, 'q', n_frontier)
+    except (OSError, struct.error, EOFError, ValueError):
+        return None
+
+    i = 0
+    for priority, size in enumerate(bucket_sizes):
+        for node_id in frontier_ids[i:i + size]:
+            frontier.push(priority, node_id)
+        i += size
+    return n_expanded
+
+
+def checkpoint_key_bytes(environment):
+    """
+    Return the number of bytes used to store each packed state of the given environment in a checkpoint.
+    :param environment: an Environment instance
+    :return: number of bytes (8 unless packed states have more than 64 bits)
+    """
+    key_bits = environment.widget_field_shift + (environment.n_widgets * environment.widget_field_bits)
+    return max(8, (key_bits + 7) // 8)
+
+
+def _write_column(f, column, typecode):
+    # write an array, bytearray, MappedArray or list column with the given element type without copying it where
+    # possible (lists are converted CHECKPOINT_CHUNK_SIZE elements at a time)
+    if isinstance(column, bytearray):
+        f.write(column)
+    elif isinstance(column, list):
+        for start in range(0, len(column), CHECKPOINT_CHUNK_SIZE):
+            array(typecode, column[start:start + CHECKPOINT_CHUNK_SIZE]).tofile(f)
+    elif column.itemsize == array(typecode).itemsize:
+        column.tofile(f)
+    else:
+        array(typecode, column).tofile(f)
+
+
+def _read_column(f, typecode, count):
+    column = array(typecode)
+    column.fromfile(f, count)
+    return column
+
+
+def remove_checkpoint(filename):
+    """
+    Remove a checkpoint file which is no longer needed (if it exists).
+    :param filename: name of checkpoint file (or None)
+    """
+    if filename is None:
+        return
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+
+def push_ucs(environment, loop_counter=None, init_state=None, prune_deadlocks=False):
+    """
+    Find a lowest cost path which solves the environment using Uniform Cost Search over push-level macro actions (see
+    Environment.get_push_successors_packed). Only the initial state and states immediately after a widget move are
+    search nodes, so BEE moves between widget moves are not expanded individually.
+
+    Each node stores the packed state before its widget move and the widget move action, and the BEE walk leading to
+    that state is found again (see Environment.get_bee_walk_actions_packed) when the path is built, so the returned path
+    contains only elements of BEE_ACTIONS.
+    loop_counter.inc() is called once per macro expansion.
+
+    This only reduces the number of nodes expanded, not the running time. Every macro expansion runs a Dijkstra over
+    the BEE poses (see Environment.get_bee_walk_packed). States with the same widget positions but a different BEE pose
+    cannot share that work, so push_ucs is usually slower than ucs. For example, on ex3 it expands 121,500 nodes
+    against 948,695, but takes about 1.7 times as long.
+
+    :param environment: an Environment instance
+    :param loop_counter: LoopCounter instance from tester (or None)
+    :param init_state: State to search from (defaults to the environment's initial state)
+    :param prune_deadlocks: if True, do not generate states with a deadlocked widget (see Environment.is_deadlocked)
+    :return: path (list of actions, where each action is an element of BEE_ACTIONS), or None if no solution exists
+    """
+    if init_state is None:
+        init_state = environment.get_init_state()
+
+    # node id -> packed state, parent node id, packed state before widget move, widget move action, best path cost
+    keys = [environment.get_canonical_key(init_state)]
+    parents = array('l', [NO_PARENT])
+    pre_push_keys = [None]
+    actions = bytearray(1)
+    path_costs = array('Q', [0])
+    node_ids = {keys[0]: 0}
+    expanded = bytearray(1)
+    # states which differ only by swapping widgets of the same type are treated as duplicates
+    canonical_key = environment.get_canonical_key_packed
+
+    frontier = BucketQueue()
+    frontier.push(0, 0)
+    while frontier:
+        path_cost, node_id = frontier.pop()
+        if expanded[node_id]:
+            continue
+        expanded[node_id] = 1
+        if loop_counter is not None:
+            loop_counter.inc()
+
+        key = keys[node_id]
+        if environment.is_solved_packed(key):
+            # expand each macro action into a walk followed by the widget move
+            path = []
+            while parents[node_id] != NO_PARENT:
+                path.append(actions[node_id])
+                parent_id = parents[node_id]
+                path.extend(reversed(environment.get_bee_walk_actions_packed(keys[parent_id], pre_push_keys[node_id])))
+                node_id = parent_id
+            path.reverse()
+            return path
+
+        for pre_push_key, action, cost, next_key in environment.get_push_successors_packed(key, prune_deadlocks):
+            next_key = canonical_key(next_key)
+            next_cost = path_cost + cost
+            next_id = node_ids.get(next_key)
+            if next_id is None:
+                next_id = len(keys)
+                node_ids[next_key] = next_id
+                keys.append(next_key)
+                parents.append(node_id)
+                pre_push_keys.append(pre_push_key)
+                actions.append(action)
+                path_costs.append(next_cost)
+                expanded.append(0)
+            elif expanded[next_id] or next_cost >= path_costs[next_id]:
+                continue
+            else:
+                parents[next_id] = node_id
+                pre_push_keys[next_id] = pre_push_key
+                actions[next_id] = action
+                path_costs[next_id] = next_cost
+            frontier.push(next_cost, next_id)
+    return None
+
+
+def bidirectional_ucs(environment, loop_counter=None, init_state=None):
+    """
+    Find a lowest cost path which solves the environment using bidirectional Uniform Cost Search. A forward search from
+    the initial state (using get_successors_packed) and a backward search from every goal state (using
+    get_goal_states_packed and get_predecessors_packed) are interleaved, always expanding the direction with the lower
+    frontier cost, so the two searches meet at around half the solution cost.
+
+    The lowest cost of a path through a state discovered by both searches is recorded. The search stops once the sum
+    of the lowest frontier costs of the two directions is no less than this cost, as no cheaper path can be found.
+
+    :param environment: an Environment instance
+    :param loop_counter: LoopCounter instance from tester (or None)
+    :param init_state: State to search from (defaults to the environment's initial state)
+    :return: path (list of actions, where each action is an element of BEE_ACTIONS), or None if no solution exists
+    """
+    if init_state is None:
+        init_state = environment.get_init_state()
+    # states which differ only by swapping widgets of the same type are treated as duplicates
+    canonical_key = environment.get_canonical_key_packed
+    root_key = canonical_key(environment.encode(init_state))
+    if environment.is_solved_packed(root_key):
+        return []
+
+    # for each direction: packed state -> path cost from the direction's root, packed state -> (neighbouring packed
+    # state towards the root, action between them), expanded states, frontier
+    forward = ({root_key: 0}, {root_key: None}, set(), BucketQueue())
+    forward[3].push(0, root_key)
+    backward = ({}, {}, set(), BucketQueue())
+    for goal_key in set(map(canonical_key, environment.get_goal_states_packed())):
+        backward[0][goal_key] = 0
+        backward[1][goal_key] = None
+        backward[3].push(0, goal_key)
+
+    best_cost = None
+    meeting_key = None
+    while forward[3] and backward[3]:
+        forward_min = forward[3].min_priority()
+        backward_min = backward[3].min_priority()
+        if best_cost is not None and forward_min + backward_min >= best_cost:
+            break
+        if forward_min <= backward_min:
+            (path_costs, links, expanded, frontier), other_path_costs = forward, backward[0]
+            neighbours = environment.get_successors_packed
+        else:
+            (path_costs, links, expanded, frontier), other_path_costs = backward, forward[0]
+            neighbours = environment.get_predecessors_packed
+
+        path_cost, key = frontier.pop()
+        if key in expanded or path_cost != path_costs[key]:
+            # stale entry
+            continue
+        expanded.add(key)
+        if loop_counter is not None:
+            loop_counter.inc()
+
+        for action, cost, next_key in neighbours(key, int_costs=True):
+            next_key = canonical_key(next_key)
+            next_cost = path_cost + cost
+            if next_key in path_costs and path_costs[next_key] <= next_cost:
+                continue
+            path_costs[next_key] = next_cost
+            links[next_key] = (key, action)
+            frontier.push(next_cost, next_key)
+            other_cost = other_path_costs.get(next_key)
+            if other_cost is not None and (best_cost is None or next_cost + other_cost < best_cost):
+                best_cost = next_cost + other_cost
+                meeting_key = next_key
+
+    if meeting_key is None:
+        return None
+    # actions from the initial state to the meeting state, then from the meeting state to the goal
+    path = reconstruct_path_from_links(forward[1], meeting_key)
+    key = meeting_key
+    while backward[1][key] is not None:
+        key, action = backward[1][key]
+        path.append(action)
+    return path
+
+
+def ida_star(environment, heuristic, loop_counter=None, init_state=None, max_table_size=DEFAULT_TABLE_SIZE,
+             bound_step=DEFAULT_BOUND_STEP):
+    """
+    Find a lowest cost path which solves the environment using Iterative Deepening A* (IDA*), a depth first search
+    repeated with an increasing bound on f = g + h. Memory use is proportional to the path length plus the size of the
+    transposition tables, rather than the number of states explored.
+
+    Two transposition tables are kept, each holding at most max_table_size states (once full, no new states are added):
+    - the lowest path cost each state has been reached with in the current iteration, used to prune paths which reach
+      a state at no lower cost (cycles along the current path are always pruned)
+    - the best known lower bound on the cost to the goal from each state, which is the heuristic value improved by the
+      lowest f value found below the state in previous iterations. This reduces the number of nodes expanded again in
+      later iterations, and avoids calling the heuristic more than once for each state.
+
+    The bound is increased by at least bound_step after each iteration, to avoid an iteration for every distinct f
+    value (e.g. for each extra 0.1 cost spin). This can overshoot the optimal cost, so once a solution is found the
+    remaining iteration continues as a branch and bound search for a cheaper solution, keeping the result optimal for
+    an admissible heuristic.
+
+    :param environment: an Environment instance
+    :param heuristic: function returning an admissible estimate of the cost to the goal from a State (e.g.
+        Solver.compute_heuristic)
+    :param loop_counter: LoopCounter instance from tester (or None)
+    :param init_state: State to search from (defaults to the environment's initial state)
+    :param max_table_size: maximum number of states in each transposition table
+    :param bound_step: minimum increase in bound between iterations, in units of 1 / COST_SCALE
+    :return: path (list of actions, where each action is an element of BEE_ACTIONS), or None if no solution exists
+    """
+    if init_state is None:
+        init_state = environment.get_init_state()
+    if environment.is_solved(init_state):
+        return []
+
+    # packed state -> lower bound on cost to goal (kept between iterations)
+    h_table = {}
+
+    def lower_bound(key, state):
+        h = h_table.get(key)
+        if h is None:
+            # round down, since any path cost is a whole number of 1 / COST_SCALE units
+            h = int((heuristic(state) * COST_SCALE) + 1e-6)
+            if len(h_table) < max_table_size:
+                h_table[key] = h
+        return h
+
+    root_key = environment.get_canonical_key(init_state)
+    bound = lower_bound(root_key, init_state)
+    while True:
+        best_path = None
+        next_bound = None
+        # packed state -> lowest path cost in this iteration
+        table = {root_key: 0}
+        path_keys = {root_key}
+        path = []
+        if loop_counter is not None:
+            loop_counter.inc()
+        # stack of [packed state, path cost, f value, successors, index of next successor, lowest f value of successors]
+        stack = [[root_key, 0, bound, environment.get_successors(init_state, int_costs=True), 0, None]]
+        while True:
+            frame = stack[-1]
+            key, path_cost, own_f, successors, i, min_f = frame
+            if i == len(successors):
+                # all successors visited - update lower bound for this state, and backtrack
+                if min_f is not None and min_f > own_f:
+                    own_f = min_f
+                    if key in h_table:
+                        h_table[key] = own_f - path_cost
+                if len(stack) == 1:
+                    break
+                stack.pop()
+                path_keys.discard(key)
+                path.pop()
+                parent = stack[-1]
+                if parent[5] is None or own_f < parent[5]:
+                    parent[5] = own_f
+                continue
+            frame[4] = i + 1
+
+            action, cost, next_state = successors[i]
+            next_cost = path_cost + cost
+            next_key = environment.get_canonical_key(next_state)
+            f = next_cost + lower_bound(next_key, next_state)
+            table_cost = table.get(next_key)
+            if (f > bound or next_key in path_keys or (table_cost is not None and table_cost <= next_cost) or
+                    environment.is_solved(next_state)):
+                # not expanded in this iteration
+                if min_f is None or f < min_f:
+                    frame[5] = f
+                if f > bound:
+                    if next_bound is None or f < next_bound:
+                        next_bound = f
+                elif environment.is_solved(next_state) and next_key not in path_keys:
+                    # only search for strictly cheaper solutions for the rest of this iteration
+                    best_path = path + [action]
+                    bound = next_cost - 1
+                continue
+
+            if table_cost is not None or len(table) < max_table_size:
+                table[next_key] = next_cost
+            if loop_counter is not None:
+                loop_counter.inc()
+            path_keys.add(next_key)
+            path.append(action)
+            stack.append([next_key, next_cost, f, environment.get_successors(next_state, int_costs=True), 0, None])
+
+        if best_path is not None:
+            return best_path
+        if next_bound is None:
+            # every reachable state has been explored
+            return None
+        bound = max(next_bound, bound + bound_step)
@@ -2,6 +2,7 @@ import sys
 from constants import *
 from environment import *
 from state import State
+from search import ucs, ida_star
 
 """
 solution.py
@@ -30,27 +31,8 @@ class Solver:
         Find a path which solves the environment using Uniform Cost Search (UCS).
         :return: path (list of actions, where each action is an element of BEE_ACTIONS)
         """
-
-        #
-        #
-        # TODO: Implement your UCS code here
-        #
-        # === Important ================================================================================================
-        # To ensure your code works correctly with tester, you should include the following line of code in your main
-        # search loop:
-        #
-        # self.loop_counter.inc()
-        #
-        # e.g.
-        # while loop_condition(): // (While exploring frontier)
-        #   self.loop_counter.inc()
-        #   ...
-        #
-        # ==============================================================================================================
-        #
-        #
-
-        pass
+        # the reference engine in search.py calls self.loop_counter.inc() once for each node expanded
+        return ucs(self.environment, self.loop_counter)
 
     # === A* Search ====================================================================================================
 
@@ -115,6 +97,18 @@ class Solver:
 
         pass
 
+    # === IDA* Search ==================================================================================================
+
+    def solve_ida_star(self):
+        """
+        Find a path which solves the environment using IDA* search with the heuristic from compute_heuristic. Uses much
+        less memory than A* search (at the cost of expanding some nodes more than once), so is suited to large levels.
+        :return: path (list of actions, where each action is an element of BEE_ACTIONS)
+        """
+        self.preprocess_heuristic()
+        # the reference engine in search.py calls self.loop_counter.inc() once for each node expanded
+        return ida_star(self.environment, self.compute_heuristic, self.loop_counter)
+
     #
     #
     # TODO: Add any additional methods here
@@ -18,7 +18,13 @@ class State:
     You may use this class and its functions. You may add your own code to this class (e.g. get_successors function,
     get_heuristic function, etc), but should avoid removing or renaming existing variables and functions to ensure
     Tester functions correctly.
+
+    Instances use __slots__, so only the attributes listed in __slots__ can be assigned (e.g. state.g = 1 raises
+    AttributeError). To store extra data in a state, add its name to __slots__ and set it in __init__, _trusted and
+    deepcopy, or keep the data outside the state (e.g. in a dict keyed by state).
     """
+    __slots__ = ('environment', 'BEE_posit', 'BEE_orient', 'widget_centres', 'widget_orients', 'force_valid',
+                 'widget_occupancy', '_hash')
 
     def __init__(self, environment, BEE_posit, BEE_orient, widget_centres, widget_orients, force_valid=True):
         """
@@ -53,6 +59,34 @@ class State:
         self.widget_centres = widget_centres
         self.widget_orients = widget_orients
         self.force_valid = force_valid
+        # (cell index -> widget id dict, bitboard of widget cells, bitboard of covered targets), computed lazily by
+        # Environment.get_widget_occupancy and shared between states with the same widget configuration (so must not be
+        # mutated)
+        self.widget_occupancy = None
+        self._hash = None
+
+    @classmethod
+    def _trusted(cls, environment, BEE_posit, BEE_orient, widget_centres, widget_orients, force_valid,
+                 widget_occupancy=None, zobrist_hash=None):
+        """
+        Construct a State without performing validity checks. Only use this for states derived from an existing valid
+        state (e.g. by Environment.perform_action), where the arguments are already known to be valid.
+
+        :param widget_occupancy: widget occupancy index for the new state, or None to compute it lazily
+        :param zobrist_hash: Zobrist hash of the new state (see Environment.get_zobrist_hash), or None to compute it
+            lazily
+        (other arguments are the same as the constructor)
+        """
+        state = cls.__new__(cls)
+        state.environment = environment
+        state.BEE_posit = BEE_posit
+        state.BEE_orient = BEE_orient
+        state.widget_centres = widget_centres
+        state.widget_orients = widget_orients
+        state.force_valid = force_valid
+        state.widget_occupancy = widget_occupancy
+        state._hash = zobrist_hash
+        return state
 
     def __eq__(self, other):
         if not isinstance(other, State):
@@ -63,11 +97,18 @@ class State:
                 self.widget_orients == other.widget_orients)
 
     def __hash__(self):
-        return hash((self.BEE_posit, self.BEE_orient, self.widget_centres, self.widget_orients))
+        # states are immutable once constructed, so the hash is only computed once (see Environment.get_zobrist_hash)
+        if self._hash is None:
+            zobrist_hash = self.environment.get_zobrist_hash(self)
+            if zobrist_hash is None:
+                # position outside the grid (only possible without validity checks) - no Zobrist hash
+                return hash((self.BEE_posit, self.BEE_orient, self.widget_centres, self.widget_orients))
+            return zobrist_hash
+        return self._hash
 
     def deepcopy(self):
-        return State(self.environment, self.BEE_posit, self.BEE_orient, self.widget_centres, self.widget_orients,
-                     force_valid=self.force_valid)
+        return State._trusted(self.environment, self.BEE_posit, self.BEE_orient, self.widget_centres,
+                              self.widget_orients, self.force_valid, self.widget_occupancy, self._hash)
 
 
 
@@ -0,0 +1,435 @@
+import mmap
+import tempfile
+from array import array
+from collections import OrderedDict
+
+"""
+state_table.py
+
+This file contains a compact table of packed states (see Environment.encode), for use as the closed set and best path
+cost table of a search.
+
+Each state added to the table is assigned a node id (in order of insertion, starting from zero). The packed state, best
+known path cost, parent node id, action from the parent and expanded flag of each node are stored in parallel arrays
+indexed by node id, and node ids are found from packed states using an open addressing hash table of node ids. This
+uses a few tens of bytes per state, compared to well over 100 bytes per state for a dict or set of packed states.
+
+DictStateTable stores the same columns, but finds node ids with a dict. This is the fastest table (dict lookups run in
+C), so it is the default for the search engines, at the cost of more memory per state.
+
+For searches which may not fit in memory, MappedStateTable stores the same arrays in memory-mapped temporary files, so
+the operating system can write cold parts of the table to disk instead of the search running out of memory.
+
+COMP3702 2024 Assignment 1 Support Code
+"""
+
+# initial number of hash table slots (must be a power of 2)
+STATE_TABLE_MIN_SLOTS = 1 << 10
+# the number of hash table slots is doubled when more than 1 / STATE_TABLE_MAX_LOAD of the slots are in use
+STATE_TABLE_MAX_LOAD = 2
+EMPTY_SLOT = -1
+NO_PARENT = -1
+# default number of recently used states held in memory by a MappedStateTable, and eviction policies for these states
+DEFAULT_CACHE_SIZE = 1 << 16
+EVICT_FIFO = 'fifo'     # evict the state which was added to the cache first
+EVICT_LRU = 'lru'       # evict the state which was least recently looked up
+# initial number of elements of each memory-mapped array
+MAPPED_MIN_CAPACITY = 1 << 12
+# multiplier for Fibonacci hashing (2^64 / golden ratio)
+FIBONACCI_MULTIPLIER = 0x9E3779B97F4A7C15
+MASK_64 = (1 << 64) - 1
+
+
+class DictStateTable:
+    """
+    Table with the same interface as PackedStateTable (node id columns, find, add and update), which finds node ids
+    using a dict of packed state -> node id instead of an open addressing hash table. Packed states may have any number
+    of bits.
+    """
+
+    def __init__(self):
+        """
+        Construct an empty table.
+        """
+        # node id -> packed state, best known path cost, parent node id, action from parent, expanded flag
+        self.keys = []
+        self.path_costs = array('Q')
+        self.parents = array('l')
+        self.actions = bytearray()
+        self.expanded = bytearray()
+        # packed state -> node id
+        self.node_ids = {}
+
+    @classmethod
+    def for_environment(cls, environment, capacity=0):
+        """
+        Construct an empty table for the packed states of the given environment (see PackedStateTable.for_environment).
+        :param environment: an Environment instance
+        :param capacity: expected number of states (ignored, a dict grows as needed)
+        :return: DictStateTable instance
+        """
+        return cls()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.node_ids
+
+    def find(self, key):
+        """
+        Return the node id of the given packed state.
+        :param key: packed state [int]
+        :return: node id, or EMPTY_SLOT if the state is not in the table
+        """
+        return self.node_ids.get(key, EMPTY_SLOT)
+
+    def add(self, key, path_cost, parent=NO_PARENT, action=0):
+        """
+        Add a packed state which is not already in the table, and return its node id.
+        :param key: packed state [int]
+        :param path_cost: path cost [int]
+        :param parent: node id of parent (NO_PARENT for the root)
+        :param action: action from parent (an element of BEE_ACTIONS)
+        :return: node id
+        """
+        node_id = len(self.keys)
+        self.node_ids[key] = node_id
+        self.keys.append(key)
+        self.path_costs.append(path_cost)
+        self.parents.append(parent)
+        self.actions.append(action)
+        self.expanded.append(0)
+        return node_id
+
+    def update(self, node_id, path_cost, parent, action):
+        """
+        Record a cheaper path to an existing node.
+        :param node_id: node id
+        :param path_cost: new path cost [int]
+        :param parent: node id of new parent
+        :param action: action from new parent
+        """
+        self.path_costs[node_id] = path_cost
+        self.parents[node_id] = parent
+        self.actions[node_id] = action
+
+
+class PackedStateTable:
+    """
+    Table mapping packed states to node ids, storing the path cost, parent node id, action and expanded flag of each
+    node. States cannot be removed, but the path cost, parent, action and expanded flag of a node may be updated.
+
+    Slots are found using Fibonacci hashing of the packed state (folded to 64 bits, see fold_key), with linear probing.
+    """
+
+    def __init__(self, capacity=0, wide_keys=False):
+        """
+        Construct an empty table.
+        :param capacity: expected number of states (the table grows as needed, so this only avoids early resizes)
+        :param wide_keys: if True, packed states are stored in a list instead of an array, so may have more than 64
+            bits (see for_environment)
+        """
+        n_slots = STATE_TABLE_MIN_SLOTS
+        while n_slots < capacity * STATE_TABLE_MAX_LOAD:
+            n_slots <<= 1
+        # node id -> packed state, best known path cost, parent node id, action from parent, expanded flag
+        self.keys = [] if wide_keys else array('Q')
+        self.path_costs = array('Q')
+        self.parents = array('l')
+        self.actions = bytearray()
+        self.expanded = bytearray()
+        self._set_slots(n_slots)
+
+    @classmethod
+    def for_environment(cls, environment, capacity=0):
+        """
+        Construct an empty table for the packed states of the given environment, storing packed states in an array if
+        they have at most 64 bits (i.e. for all but very large levels with many widgets).
+        :param environment: an Environment instance
+        :param capacity: expected number of states
+        :return: PackedStateTable instance
+        """
+        key_bits = environment.widget_field_shift + (environment.n_widgets * environment.widget_field_bits)
+        return cls(capacity, wide_keys=key_bits > 64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return self.find(key) != EMPTY_SLOT
+
+    def find(self, key):
+        """
+        Return the node id of the given packed state.
+        :param key: packed state [int]
+        :return: node id, or EMPTY_SLOT if the state is not in the table
+        """
+        slots = self.slots
+        keys = self.keys
+        mask = len(slots) - 1
+        i = (((key if key <= MASK_64 else fold_key(key)) * FIBONACCI_MULTIPLIER) & MASK_64) >> self.hash_shift
+        while True:
+            node_id = slots[i]
+            if node_id == EMPTY_SLOT or keys[node_id] == key:
+                return node_id
+            i = (i + 1) & mask
+
+    def add(self, key, path_cost, parent=NO_PARENT, action=0):
+        """
+        Add a packed state which is not already in the table, and return its node id.
+        :param key: packed state [int]
+        :param path_cost: path cost [int]
+        :param parent: node id of parent (NO_PARENT for the root)
+        :param action: action from parent (an element of BEE_ACTIONS)
+        :return: node id
+        """
+        node_id = len(self.keys)
+        if (node_id + 1) * STATE_TABLE_MAX_LOAD > len(self.slots):
+            self._set_slots(len(self.slots) << 1)
+        self.keys.append(key)
+        self.path_costs.append(path_cost)
+        self.parents.append(parent)
+        self.actions.append(action)
+        self.expanded.append(0)
+        self._insert(key, node_id)
+        return node_id
+
+    def update(self, node_id, path_cost, parent, action):
+        """
+        Record a cheaper path to an existing node.
+        :param node_id: node id
+        :param path_cost: new path cost [int]
+        :param parent: node id of new parent
+        :param action: action from new parent
+        """
+        self.path_costs[node_id] = path_cost
+        self.parents[node_id] = parent
+        self.actions[node_id] = action
+
+    def memory_usage(self):
+        """
+        Return the number of bytes used by the arrays of this table.
+        :return: size in bytes
+        """
+        size = sum(a.itemsize * len(a) for a in (self.path_costs, self.parents, self.slots))
+        size += len(self.actions) + len(self.expanded)
+        if isinstance(self.keys, list):
+            return size + sum(key.__sizeof__() + 8 for key in self.keys)
+        return size + (self.keys.itemsize * len(self.keys))
+
+    def _insert(self, key, node_id):
+        slots = self.slots
+        mask = len(slots) - 1
+        i = (((key if key <= MASK_64 else fold_key(key)) * FIBONACCI_MULTIPLIER) & MASK_64) >> self.hash_shift
+        while slots[i] != EMPTY_SLOT:
+            i = (i + 1) & mask
+        slots[i] = node_id
+
+    def _new_slots(self, n_slots):
+        return array('l', [EMPTY_SLOT]) * n_slots
+
+    def _set_slots(self, n_slots):
+        # rebuild the hash table with the given number of slots (node ids and parallel arrays are unchanged)
+        self.slots = self._new_slots(n_slots)
+        self.hash_shift = 64 - (n_slots.bit_length() - 1)
+        for node_id, key in enumerate(self.keys):
+            self._insert(key, node_id)
+
+
+def fold_key(key):
+    """
+    Fold a packed state with more than 64 bits into 64 bits by XORing together its 64-bit chunks, so that every field
+    of the packed state affects its hash table slot.
+    :param key: packed state [int]
+    :return: folded key [int]
+    """
+    folded = 0
+    while key:
+        folded ^= key & MASK_64
+        key >>= 64
+    return folded
+
+
+class MappedStateTable(PackedStateTable):
+    """
+    PackedStateTable which stores its arrays in memory-mapped temporary files (see MappedArray) instead of memory.
+
+    The operating system keeps recently used pages of each file in memory and writes other pages to disk when memory
+    is short, so a search using this table slows down as it outgrows memory rather than being killed. To avoid reading
+    cold pages of the hash table for states which are looked up often, the node ids of up to cache_size recently used
+    states are also held in an in-memory front cache, with either EVICT_FIFO or EVICT_LRU eviction.
+
+    Packed states must have at most 64 bits. Call close() when the table is no longer needed to release its files.
+    """
+
+    def __init__(self, capacity=0, directory=None, cache_size=DEFAULT_CACHE_SIZE, eviction=EVICT_LRU):
+        """
+        Construct an empty table.
+        :param capacity: expected number of states (the table grows as needed, so this only avoids early resizes)
+        :param directory: directory for the temporary files (defaults to the system temporary directory)
+        :param cache_size: maximum number of states in the in-memory front cache
+        :param eviction: EVICT_FIFO or EVICT_LRU
+        """
+        if eviction not in (EVICT_FIFO, EVICT_LRU):
+            raise ValueError(f'unknown eviction policy {eviction!r}')
+        self.directory = directory
+        self.cache_size = cache_size
+        self.eviction = eviction
+        self.cache = OrderedDict()
+        self.slots = None
+        capacity = max(capacity, MAPPED_MIN_CAPACITY)
+        self.keys = MappedArray('Q', capacity, directory)
+        self.path_costs = MappedArray('Q', capacity, directory)
+        self.parents = MappedArray('q', capacity, directory)
+        self.actions = MappedArray('B', capacity, directory)
+        self.expanded = MappedArray('B', capacity, directory)
+        n_slots = STATE_TABLE_MIN_SLOTS
+        while n_slots < capacity * STATE_TABLE_MAX_LOAD:
+            n_slots <<= 1
+        self._set_slots(n_slots)
+
+    @classmethod
+    def for_environment(cls, environment, capacity=0, **kwargs):
+        """
+        Construct an empty table for the packed states of the given environment.
+        :param environment: an Environment instance
+        :param capacity: expected number of states
+        :param kwargs: other arguments for the constructor (directory, cache_size, eviction)
+        :return: MappedStateTable instance
+        """
+        key_bits = environment.widget_field_shift + (environment.n_widgets * environment.widget_field_bits)
+        if key_bits > 64:
+            raise ValueError(f'packed states of this level have {key_bits} bits, MappedStateTable supports at most 64')
+        return cls(capacity, **kwargs)
+
+    def find(self, key):
+        node_id = self.cache.get(key)
+        if node_id is not None:
+            if self.eviction == EVICT_LRU:
+                self.cache.move_to_end(key)
+            return node_id
+        node_id = super().find(key)
+        if node_id != EMPTY_SLOT:
+            self._cache_put(key, node_id)
+        return node_id
+
+    def add(self, key, path_cost, parent=NO_PARENT, action=0):
+        node_id = super().add(key, path_cost, parent, action)
+        self._cache_put(key, node_id)
+        return node_id
+
+    def close(self):
+        """
+        Release the memory-mapped files of this table (the files are deleted automatically).
+        """
+        for a in (self.keys, self.path_costs, self.parents, self.actions, self.expanded, self.slots):
+            a.close()
+        self.cache.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _cache_put(self, key, node_id):
+        self.cache[key] = node_id
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _new_slots(self, n_slots):
+        if self.slots is not None:
+            self.slots.close()
+        slots = MappedArray('q', n_slots, self.directory)
+        slots.fill(EMPTY_SLOT, n_slots)
+        return slots
+
+
+class MappedArray:
+    """
+    Growable array of fixed size integers stored in a memory-mapped temporary file, supporting the subset of the
+    array.array interface used by PackedStateTable (indexing, len, iteration and append).
+    """
+
+    def __init__(self, typecode, capacity=MAPPED_MIN_CAPACITY, directory=None):
+        """
+        Construct an empty array.
+        :param typecode: array typecode of the elements (e.g. 'Q')
+        :param capacity: initial number of elements which can be stored before the file is resized
+        :param directory: directory for the temporary file (defaults to the system temporary directory)
+        """
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+        self.length = 0
+        self.capacity = 0
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._map = None
+        self._view = None
+        self._resize(max(capacity, 1))
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if i >= self.length:
+            raise IndexError('MappedArray index out of range')
+        return self._view[i]
+
+    def __setitem__(self, i, value):
+        if i >= self.length:
+            raise IndexError('MappedArray index out of range')
+        self._view[i] = value
+
+    def __iter__(self):
+        for i in range(self.length):
+            yield self._view[i]
+
+    def tofile(self, f):
+        """
+        Write the elements of the array to the given binary file (in the same format as array.tofile).
+        :param f: binary file object
+        """
+        f.write(self._view[:self.length].cast('B'))
+
+    def __bytes__(self):
+        return self.tobytes()
+
+    def tobytes(self):
+        return self._view[:self.length].tobytes()
+
+    def append(self, value):
+        if self.length == self.capacity:
+            self._resize(self.capacity << 1)
+        self._view[self.length] = value
+        self.length += 1
+
+    def fill(self, value, n):
+        """
+        Set the length of the array to n, with every element equal to value.
+        :param value: element value
+        :param n: new length
+        """
+        if n > self.capacity:
+            self._resize(n)
+        chunk = array(self.typecode, [value]) * min(n, MAPPED_MIN_CAPACITY)
+        for start in range(0, n, len(chunk)):
+            count = min(len(chunk), n - start)
+            self._view[start:start + count] = memoryview(chunk)[:count]
+        self.length = n
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            self._map.close()
+            self._view = None
+        self._file.close()
+
+    def _resize(self, capacity):
+        if self._view is not None:
+            self._view.release()
+            self._map.close()
+        self._file.truncate(capacity * self.itemsize)
+        self._map = mmap.mmap(self._file.fileno(), capacity * self.itemsize)
+        self._view = memoryview(self._map).cast(self.typecode)
+        self.capacity = capacity
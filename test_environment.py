@@ -0,0 +1,75 @@
+import os
+import random
+import unittest
+from environment import Environment
+from state import State
+
+"""
+test_environment.py
+
+Tests for the reverse transition model and state hashing in environment.py.
+Run with: python -m unittest test_environment
+
+COMP3702 2024 Assignment 1 Support Code
+"""
+
+TESTCASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testcases')
+
+
+class PredecessorTest(unittest.TestCase):
+
+    def check_random_walk(self, filename, n_steps, seed):
+        env = Environment(os.path.join(TESTCASE_DIR, filename))
+        rng = random.Random(seed)
+        key = env.encode(env.get_init_state())
+        n_widget_moves = 0
+        for _ in range(n_steps):
+            action, cost, next_key = rng.choice(env.get_successors_packed(key, int_costs=True))
+            if (key ^ next_key) >> env.widget_field_shift:
+                n_widget_moves += 1
+            # every move taken forwards is a predecessor of the child
+            predecessors = env.get_predecessors_packed(next_key, int_costs=True)
+            self.assertIn((action, cost, key), predecessors)
+            # every predecessor leads back to the child
+            for prev_action, prev_cost, prev_key in predecessors:
+                self.assertEqual(env.perform_action_packed(prev_key, prev_action, int_costs=True),
+                                 (True, prev_cost, next_key))
+            key = next_key
+        # the walk must have pushed, pulled or rotated widgets to test the widget predecessors
+        self.assertGreater(n_widget_moves, 0)
+
+    def test_random_walks(self):
+        for i in range(1, 6):
+            with self.subTest(testcase=i):
+                self.check_random_walk(f'ex{i}.txt', 2000, i)
+
+
+class StateHashTest(unittest.TestCase):
+
+    def test_hash_matches_fresh_state(self):
+        # states created by get_successors receive an incrementally updated hash, which must match a new State's hash
+        env = Environment(os.path.join(TESTCASE_DIR, 'ex3.txt'))
+        rng = random.Random(0)
+        state = env.get_init_state()
+        for _ in range(2000):
+            state = rng.choice(env.get_successors(state))[2]
+            fresh = State(env, state.BEE_posit, state.BEE_orient, state.widget_centres, state.widget_orients)
+            self.assertEqual(hash(fresh), hash(state))
+            self.assertEqual(env.get_zobrist_hash(fresh), env.get_zobrist_hash_packed(env.encode(state)))
+
+    def test_positions_outside_grid(self):
+        # states constructed without validity checks may lie outside the grid, and must still be hashable
+        env = Environment(os.path.join(TESTCASE_DIR, 'ex1.txt'))
+        init = env.get_init_state()
+        for BEE_posit, widget_centres in (((50, 0), init.widget_centres), ((-1, 0), init.widget_centres),
+                                          (init.BEE_posit, ((50, 50),) + init.widget_centres[1:]),
+                                          (init.BEE_posit, ((-1, 2),) + init.widget_centres[1:])):
+            states = [State(env, BEE_posit, init.BEE_orient, widget_centres, init.widget_orients, force_valid=False)
+                      for _ in range(2)]
+            self.assertEqual(hash(states[0]), hash(states[1]))
+            self.assertIsNone(env.get_zobrist_hash(states[0]))
+            self.assertEqual(len({states[0], states[1], init}), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
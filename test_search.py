@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+from environment import Environment
+from search import ucs, ida_star
+from parallel_search import hda_star
+
+"""
+test_search.py
+
+Tests for the search engines in search.py and parallel_search.py. Run with: python -m unittest test_search
+
+COMP3702 2024 Assignment 1 Support Code
+"""
+
+TESTCASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testcases')
+
+
+def replay(env, path):
+    # return the total cost of performing the path from the initial state, and whether the final state is solved
+    state = env.get_init_state()
+    total_cost = 0
+    for action in path:
+        success, cost, state = env.perform_action(state, action)
+        assert success, 'path contains an invalid action'
+        total_cost += cost
+    return total_cost, env.is_solved(state)
+
+
+def failing_heuristic_factory(environment):
+    # heuristic factory for hda_star which fails in every worker (must be picklable, so defined at module level)
+    raise ValueError('heuristic factory failed')
+
+
+class Interrupt(Exception):
+    pass
+
+
+class InterruptingCounter:
+    # loop counter which raises Interrupt after the given number of iterations (simulating a killed search)
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.n = 0
+
+    def inc(self):
+        self.n += 1
+        if self.n >= self.limit:
+            raise Interrupt
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_resume_matches_uninterrupted_run(self):
+        env = Environment(os.path.join(TESTCASE_DIR, 'ex2.txt'))
+        stats = {}
+        path = ucs(env, stats=stats)
+
+        checkpoint_file = os.path.join(self.directory, 'ex2.ckpt')
+        with self.assertRaises(Interrupt):
+            ucs(env, InterruptingCounter(stats['n_expanded'] // 2), checkpoint_file=checkpoint_file,
+                checkpoint_interval=0)
+        self.assertTrue(os.path.exists(checkpoint_file))
+
+        resumed_stats = {}
+        resumed_path = ucs(env, checkpoint_file=checkpoint_file, checkpoint_interval=0, stats=resumed_stats)
+        self.assertGreater(resumed_stats['n_restored'], 0)
+        self.assertEqual(resumed_path, path)
+        self.assertEqual(resumed_stats['n_expanded'], stats['n_expanded'])
+        # the checkpoint is removed once the search is complete
+        self.assertFalse(os.path.exists(checkpoint_file))
+
+
+class IDAStarTest(unittest.TestCase):
+
+    def test_matches_ucs_cost(self):
+        env = Environment(os.path.join(TESTCASE_DIR, 'ex1.txt'))
+        ucs_cost = replay(env, ucs(env))[0]
+        # the smaller table holds fewer states than ucs expands on ex1, so the table size limit is reached
+        for max_table_size in (1 << 20, 1 << 10):
+            with self.subTest(max_table_size=max_table_size):
+                total_cost, solved = replay(env, ida_star(env, lambda state: 0, max_table_size=max_table_size))
+                self.assertTrue(solved)
+                self.assertAlmostEqual(total_cost, ucs_cost)
+
+
+class HDAStarTest(unittest.TestCase):
+
+    def test_reaches_target_cost(self):
+        for i in (1, 2):
+            with self.subTest(testcase=i):
+                env = Environment(os.path.join(TESTCASE_DIR, f'ex{i}.txt'))
+                total_cost, solved = replay(env, hda_star(env, 2))
+                self.assertTrue(solved)
+                self.assertLessEqual(total_cost, env.cost_tgt + 1e-6)
+
+    def test_worker_failure(self):
+        env = Environment(os.path.join(TESTCASE_DIR, 'ex1.txt'))
+        with self.assertRaises(RuntimeError):
+            hda_star(env, 2, heuristic_factory=failing_heuristic_factory)
+
+
+if __name__ == '__main__':
+    unittest.main()
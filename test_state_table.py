@@ -0,0 +1,64 @@
+import random
+import unittest
+from state_table import (DictStateTable, PackedStateTable, MappedStateTable, EMPTY_SLOT, FIBONACCI_MULTIPLIER, MASK_64,
+                         fold_key)
+
+"""
+test_state_table.py
+
+Tests for the packed state tables in state_table.py. Run with: python -m unittest test_state_table
+
+COMP3702 2024 Assignment 1 Support Code
+"""
+
+
+class PackedStateTableTest(unittest.TestCase):
+
+    def check_table(self, table, keys):
+        node_ids = {}
+        for n, key in enumerate(keys):
+            self.assertEqual(table.find(key), node_ids.get(key, EMPTY_SLOT))
+            if key not in node_ids:
+                node_ids[key] = table.add(key, n, n - 1, n % 4)
+        self.assertEqual(len(table), len(node_ids))
+        for key, node_id in node_ids.items():
+            self.assertEqual(table.find(key), node_id)
+            self.assertEqual(table.keys[node_id], key)
+
+    def max_probe_length(self, table):
+        # largest distance of any node from the slot its packed state hashes to
+        mask = len(table.slots) - 1
+        longest = 0
+        for i, node_id in enumerate(table.slots):
+            if node_id != EMPTY_SLOT:
+                key = table.keys[node_id] if table.keys[node_id] <= MASK_64 else fold_key(table.keys[node_id])
+                home = ((key * FIBONACCI_MULTIPLIER) & MASK_64) >> table.hash_shift
+                longest = max(longest, (i - home) & mask)
+        return longest
+
+    def test_random_keys(self):
+        rng = random.Random(0)
+        keys = [rng.getrandbits(64) for _ in range(20000)]
+        self.check_table(PackedStateTable(), keys + keys[:1000])
+
+    def test_dict_table(self):
+        rng = random.Random(2)
+        keys = [rng.getrandbits(64) for _ in range(20000)]
+        self.check_table(DictStateTable(), keys + keys[:1000])
+
+    def test_mapped_table(self):
+        rng = random.Random(1)
+        keys = [rng.getrandbits(64) for _ in range(20000)]
+        with MappedStateTable(cache_size=100) as table:
+            self.check_table(table, keys + keys[:1000])
+
+    def test_wide_keys_differing_above_64_bits(self):
+        # keys which differ only in bits above 64 (e.g. the placement of the last widget) must not share a probe chain
+        keys = [(i << 70) | 12345 for i in range(20000)]
+        table = PackedStateTable(wide_keys=True)
+        self.check_table(table, keys)
+        self.assertLess(self.max_probe_length(table), 64)
+
+
+if __name__ == '__main__':
+    unittest.main()
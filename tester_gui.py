@@ -15,6 +15,7 @@ else:
 
 from constants import *
 from environment import Environment
+from corpus import LevelCorpus
 
 """
 Tester script. *******WITH GUI*******
@@ -35,6 +36,8 @@ THREADS = 1
 
 TC_PREFIX = 'testcases/ex'
 TC_SUFFIX = '.txt'
+# if set to the name of a corpus file (see corpus.py), testcase numbers select levels from the corpus (starting from 1)
+TC_CORPUS = None
 FORCE_VALID = True
 DISABLE_TIME_LIMITS = True
 
@@ -124,6 +127,14 @@ def print_usage():
     print("    if -v is specified, the solver's trajectory will be visualised")
 
 
+def load_testcase(i, corpus=None):
+    # load testcase i from the given LevelCorpus (opened from TC_CORPUS), otherwise from the testcase file
+    # TC_PREFIX + i + TC_SUFFIX
+    if corpus is not None:
+        return corpus.get_environment(i - 1, FORCE_VALID)
+    return Environment(TC_PREFIX + str(i) + TC_SUFFIX, FORCE_VALID)
+
+
 def compute_score(points, scaling, actual, target):
     return points * (1.0 - min(max(actual - target, 0) / (scaling * target), 1.0))
 
@@ -420,11 +431,19 @@ def main(arglist):
     # OLD: max_score = POINTS_PER_TESTCASE * len(tc_idx) * (2.0 if search_type == 'both' else 1.0)
     tests = []
     leaderboard = []
+
+    # load each selected testcase once, opening the corpus (if set) only once
+    corpus = LevelCorpus(TC_CORPUS) if TC_CORPUS is not None else None
+    try:
+        envs = {i: load_testcase(i, corpus) for i in tc_idx}
+    finally:
+        if corpus is not None:
+            corpus.close()
+
     if THREADS == 1 or visualise:   # run sequentially if visualise is enabled
         # loop over all selected testcases
         for i in tc_idx:
-            tc_filename = TC_PREFIX + str(i) + TC_SUFFIX
-            env = Environment(tc_filename, FORCE_VALID)
+            env = envs[i]
 
             for s in search_types:
                 test_result, leaderboard_result = run_test_mp((env, s, i, visualise))
@@ -435,7 +454,7 @@ def main(arglist):
                 # print(test_result['output'])
     else:   # run in parallel otherwise
         from multiprocessing import Pool
-        inputs = [(Environment(TC_PREFIX + str(i) + TC_SUFFIX, FORCE_VALID), s, i, False) for i in tc_idx
+        inputs = [(envs[i], s, i, False) for i in tc_idx
                   for s in search_types]
         with Pool(THREADS) as p:
             results = p.map(run_test_mp, inputs)